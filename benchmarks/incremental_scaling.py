@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import tempfile
+
+from benchmarks.suite import BenchmarkSession, time_edit
+from benchmarks.synthetic import SyntheticSpec
+
+
+TEMPLATES_PER_MODULE = 100
+
+
+def measure(template_count: int, repeats: int) -> float:
+    spec = SyntheticSpec(
+        modules=-(-template_count // TEMPLATES_PER_MODULE),
+        templates=min(template_count, TEMPLATES_PER_MODULE),
+        include_depth=1,
+        themes=0,
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        session = BenchmarkSession(Path(directory), spec)
+        session.render()
+        return time_edit(session, repeats)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time single-file live updates as the repository grows"
+    )
+    parser.add_argument(
+        "sizes",
+        nargs="*",
+        type=int,
+        default=[100, 1000, 5000, 10000, 20000, 50000],
+    )
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    for size in args.sizes:
+        print(f"{size:>6} templates: {measure(size, args.repeats) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import argparse
+from collections.abc import Callable
+from copy import copy
+from dataclasses import asdict
+import json
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any
+
+from benchmarks.synthetic import (
+    SyntheticSpec,
+    module_name,
+    template_name,
+    theme_name,
+    write_repository,
+)
+from stash.config import changed_variable_paths, template_variables
+from stash.live import BYTECODE_CACHE_DIRECTORY, LiveState, render_live
+from stash.templates import (
+    TemplateBytecodeCache,
+    TemplateMetadataCache,
+    template_metadata,
+)
+
+
+DEFAULT_THRESHOLD = 0.25
+
+
+class BenchmarkSession:
+    def __init__(self, root: Path, spec: SyntheticSpec) -> None:
+        self.root = root
+        self.dotfiles, self.config = write_repository(root, spec)
+        self.live_root = root / "live"
+        self.metadata_cache = TemplateMetadataCache()
+        self.bytecode_cache = TemplateBytecodeCache(
+            self.live_root / BYTECODE_CACHE_DIRECTORY
+        )
+        self.theme_name: str | None = self.config.get("theme")
+        self.state: LiveState | None = None
+
+    def render(self, config: dict[str, Any] | None = None, **kwargs: Any) -> None:
+        self.state = render_live(
+            config or self.config,
+            self.dotfiles,
+            self.live_root,
+            self.state,
+            theme_name=self.theme_name,
+            metadata_cache=self.metadata_cache,
+            bytecode_cache=self.bytecode_cache,
+            **kwargs,
+        )
+
+    def variables(self, config: dict[str, Any], theme: str | None) -> dict:
+        return template_variables(config, self.dotfiles, theme)
+
+    def fresh(self, name: str) -> BenchmarkSession:
+        session = copy(self)
+        session.live_root = self.root / name
+        session.metadata_cache = TemplateMetadataCache()
+        session.bytecode_cache = TemplateBytecodeCache(
+            session.live_root / BYTECODE_CACHE_DIRECTORY
+        )
+        session.state = None
+        return session
+
+
+def _median(run: Callable[[int], None], repeats: int) -> float:
+    timings: list[float] = []
+    for repeat in range(repeats):
+        started = time.perf_counter()
+        run(repeat)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def time_edit(session: BenchmarkSession, repeats: int) -> float:
+    edited = (session.dotfiles / module_name(0) / template_name(0)).resolve()
+
+    def run(repeat: int) -> None:
+        edited.write_text(f"edit {repeat}\n")
+        session.metadata_cache.invalidate({edited})
+        session.render(changed_paths={edited}, changed_variables=set())
+
+    return _median(run, repeats)
+
+
+def _time_variable_change(session: BenchmarkSession, repeats: int) -> float:
+    name = module_name(0)
+
+    def run(repeat: int) -> None:
+        previous = session.variables(session.config, session.theme_name)
+        session.config["variables"][name] = f"value {repeat}"
+        changed = changed_variable_paths(
+            previous,
+            session.variables(session.config, session.theme_name),
+        )
+        session.render(changed_paths=set(), changed_variables=changed)
+
+    return _median(run, repeats)
+
+
+def _time_theme_switch(
+    session: BenchmarkSession, spec: SyntheticSpec, repeats: int
+) -> float:
+    def run(repeat: int) -> None:
+        previous = session.variables(session.config, session.theme_name)
+        session.theme_name = theme_name((repeat + 1) % spec.themes)
+        changed = changed_variable_paths(
+            previous,
+            session.variables(session.config, session.theme_name),
+        )
+        session.render(changed_paths=set(), changed_variables=changed)
+
+    return _median(run, repeats)
+
+
+def _time_metadata_scan(session: BenchmarkSession, repeats: int) -> float:
+    modules = [session.dotfiles / name for name in session.config["dotfiles"]]
+
+    def run(_: int) -> None:
+        for module in modules:
+            template_metadata(module)
+
+    return _median(run, repeats)
+
+
+def run_suite(spec: SyntheticSpec, repeats: int) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        session = BenchmarkSession(Path(directory), spec)
+        results = {
+            "full_render": _median(
+                lambda repeat: session.fresh(f"live{repeat}").render(),
+                repeats,
+            )
+        }
+        session.render()
+        results["reload"] = _median(lambda _: session.render(), repeats)
+        results["single_edit"] = time_edit(session, repeats)
+        results["variable_change"] = _time_variable_change(session, repeats)
+        if spec.themes > 1:
+            results["theme_switch"] = _time_theme_switch(session, spec, repeats)
+        results["metadata_scan"] = _time_metadata_scan(session, repeats)
+        return results
+
+
+def regressions(
+    results: dict[str, float],
+    baseline: dict[str, float],
+    threshold: float,
+) -> dict[str, tuple[float, float]]:
+    return {
+        name: (baseline[name], seconds)
+        for name, seconds in results.items()
+        if name in baseline and seconds > baseline[name] * (1 + threshold)
+    }
+
+
+def _load_baseline(path: Path, spec: SyntheticSpec) -> dict[str, float] | None:
+    try:
+        data = json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    if data["spec"] != asdict(spec):
+        raise SystemExit(f"Baseline {path} was recorded for a different repository")
+    return data["results"]
+
+
+def _save_baseline(path: Path, spec: SyntheticSpec, results: dict[str, float]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps({"spec": asdict(spec), "results": results}, indent=2, sort_keys=True)
+        + "\n"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Time live renders against a synthetic dotfiles repository"
+    )
+    parser.add_argument("--modules", type=int, default=SyntheticSpec.modules)
+    parser.add_argument("--templates", type=int, default=SyntheticSpec.templates)
+    parser.add_argument(
+        "--include-depth",
+        type=int,
+        default=SyntheticSpec.include_depth,
+    )
+    parser.add_argument("--themes", type=int, default=SyntheticSpec.themes)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    spec = SyntheticSpec(args.modules, args.templates, args.include_depth, args.themes)
+    results = run_suite(spec, args.repeats)
+    for name, seconds in results.items():
+        print(f"{name:>16}: {seconds * 1000:10.2f} ms")
+
+    if args.baseline is None:
+        return 0
+    if args.save_baseline:
+        _save_baseline(args.baseline, spec, results)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    baseline = _load_baseline(args.baseline, spec)
+    if baseline is None:
+        print(f"No baseline at {args.baseline}")
+        return 0
+    slower = regressions(results, baseline, args.threshold)
+    for name, (before, after) in slower.items():
+        print(f"Regression in {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms")
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from stash.config import BASE16_COLOR_NAMES
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    modules: int = 10
+    templates: int = 100
+    include_depth: int = 1
+    themes: int = 2
+
+    @property
+    def template_count(self) -> int:
+        return self.modules * self.templates
+
+
+def module_name(index: int) -> str:
+    return f"module{index:04d}"
+
+
+def template_name(index: int) -> str:
+    return f"template{index:05d}"
+
+
+def theme_name(index: int) -> str:
+    return f"theme{index:02d}"
+
+
+def _theme_colors(index: int) -> dict[str, str]:
+    return {
+        name: f"{(index * 16 + position) % 0xFFFFFF:06x}"
+        for position, name in enumerate(sorted(BASE16_COLOR_NAMES))
+    }
+
+
+def _write_partials(module: Path, depth: int) -> str | None:
+    if depth == 0:
+        return None
+    for level in range(depth):
+        if level == depth - 1:
+            body = "{{ shared }}\n"
+        else:
+            body = f"{{% include 'partial{level + 1}.j2' %}}\n"
+        (module / f"partial{level}.j2").write_text(body)
+    return "partial0.j2"
+
+
+def write_repository(root: Path, spec: SyntheticSpec) -> tuple[Path, dict[str, Any]]:
+    dotfiles = root / "dotfiles"
+    target = root / "target"
+    modules: dict[str, dict[str, str]] = {}
+    variables: dict[str, Any] = {"shared": "value"}
+    for module_index in range(spec.modules):
+        name = module_name(module_index)
+        module = dotfiles / name
+        module.mkdir(parents=True)
+        partial = _write_partials(module, spec.include_depth)
+        body = f"{{{{ {name} }}}}"
+        if spec.themes:
+            body += " {{ colors.base0D }}"
+        if partial is not None:
+            body += f" {{% include '{partial}' %}}"
+        for index in range(spec.templates):
+            (module / template_name(index)).write_text(f"{index} {body}\n")
+        modules[name] = {"target": (target / name).as_posix()}
+        variables[name] = "first"
+    config: dict[str, Any] = {"variables": variables, "dotfiles": modules}
+    if spec.themes:
+        config["theme"] = theme_name(0)
+        config["themes"] = {
+            theme_name(index): _theme_colors(index) for index in range(spec.themes)
+        }
+    return dotfiles, config
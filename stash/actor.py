@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class RenderCancelledError(RuntimeError):
+    pass
+
+
+class CancelToken:
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise RenderCancelledError("Render was superseded by a newer request")
+
+
+def _call(job: Callable[[CancelToken], T], token: CancelToken) -> T:
+    token.check()
+    return job(token)
+
+
+class RenderActor:
+    def __init__(self) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="render",
+        )
+        self._tokens: dict[str, CancelToken] = {}
+
+    async def run(
+        self,
+        job: Callable[[CancelToken], T],
+        key: str | None = None,
+    ) -> T:
+        token = CancelToken()
+        if key is not None:
+            previous = self._tokens.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._tokens[key] = token
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                _call,
+                job,
+                token,
+            )
+        finally:
+            if key is not None and self._tokens.get(key) is token:
+                del self._tokens[key]
+
+    def close(self) -> None:
+        for token in self._tokens.values():
+            token.cancel()
+        self._executor.shutdown(wait=True)
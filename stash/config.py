@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
@@ -7,16 +8,69 @@ import yaml
 
 
 BASE16_COLOR_NAMES = frozenset(f"base{index:02X}" for index in range(16))
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+ConfigKey = tuple[int, int, int]
 
 
 def load_config(path: Path) -> dict[str, Any]:
     if not path.exists():
         raise FileNotFoundError(path)
     with path.open("r", encoding="utf-8") as handle:
-        config = yaml.safe_load(handle) or {}
+        config = yaml.load(handle, Loader=SafeLoader) or {}
     return config
 
 
+class CachedConfig:
+    def __init__(self, data: dict[str, Any], key: ConfigKey | None = None) -> None:
+        self.data = data
+        self.key = key
+        self._themes: dict[str | None, tuple[str, dict[str, str]] | None] = {}
+        self._variables: dict[tuple[Path, str | None], dict[str, Any]] = {}
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.data.get(name, default)
+
+    def resolve_theme(
+        self,
+        theme_name: str | None = None,
+    ) -> tuple[str, dict[str, str]] | None:
+        if theme_name not in self._themes:
+            self._themes[theme_name] = resolve_theme(self.data, theme_name)
+        selected_theme = self._themes[theme_name]
+        if selected_theme is None:
+            return None
+        selected_name, colors = selected_theme
+        return selected_name, dict(colors)
+
+    def template_variables(
+        self,
+        dotfiles: Path,
+        theme_name: str | None = None,
+    ) -> dict[str, Any]:
+        key = (dotfiles, theme_name)
+        if key not in self._variables:
+            self._variables[key] = template_variables(self.data, dotfiles, theme_name)
+        return dict(self._variables[key])
+
+
+class ConfigCache:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._cached: CachedConfig | None = None
+
+    def load(self) -> CachedConfig:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._cached = None
+            raise
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._cached is None or self._cached.key != key:
+            self._cached = CachedConfig(load_config(self.path), key)
+        return self._cached
+
+
 def write_config(path: Path, config: dict[str, Any]) -> None:
     with path.open("w", encoding="utf-8") as handle:
         yaml.safe_dump(config, handle, sort_keys=False)
@@ -40,6 +94,23 @@ def module_target(module_name: str, module_config: dict[str, Any]) -> Path:
     return Path.home() / ".config" / module_name
 
 
+def library_root(config: dict[str, Any], dotfiles: Path) -> Path | None:
+    configured = config.get("library_dir")
+    if configured is None:
+        return None
+    if not isinstance(configured, str) or not configured:
+        raise ValueError("Config 'library_dir' must be a relative path")
+    relative_path = Path(configured)
+    if relative_path.is_absolute():
+        raise ValueError(
+            "Config 'library_dir' must be relative to the dotfiles directory"
+        )
+    root = (dotfiles / relative_path).resolve()
+    if root == dotfiles.resolve() or not root.is_relative_to(dotfiles.resolve()):
+        raise ValueError("Config 'library_dir' must stay within the dotfiles directory")
+    return root
+
+
 def theme_names(config: dict[str, Any]) -> list[str]:
     themes = config.get("themes")
     if themes is None:
@@ -74,6 +145,96 @@ def template_variables(
     return variables
 
 
+def changed_variable_paths(
+    old_variables: dict[str, Any],
+    new_variables: dict[str, Any],
+    prefix: str = "",
+) -> set[str]:
+    changed_paths: set[str] = set()
+    for name in set(old_variables) | set(new_variables):
+        path = f"{prefix}{name}"
+        if name not in old_variables or name not in new_variables:
+            changed_paths.add(path)
+            continue
+        old_value = old_variables[name]
+        new_value = new_variables[name]
+        if old_value is new_value or old_value == new_value:
+            continue
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            changed_paths.update(
+                changed_variable_paths(old_value, new_value, f"{path}.")
+            )
+        else:
+            changed_paths.add(path)
+    return changed_paths
+
+
+@dataclass(frozen=True)
+class ConfigDiff:
+    variables: frozenset[str] = frozenset()
+    added_modules: frozenset[str] = frozenset()
+    removed_modules: frozenset[str] = frozenset()
+    retargeted_modules: frozenset[str] = frozenset()
+    library_changed: bool = False
+
+    @property
+    def is_empty(self) -> bool:
+        return not (
+            self.variables
+            or self.added_modules
+            or self.removed_modules
+            or self.retargeted_modules
+            or self.library_changed
+        )
+
+
+def _mapping(config: CachedConfig, name: str) -> dict[Any, Any]:
+    value = config.get(name)
+    return value if isinstance(value, dict) else {}
+
+
+def _theme_variables(
+    config: CachedConfig,
+    theme_name: str | None,
+) -> dict[str, Any]:
+    selected_theme = config.resolve_theme(theme_name)
+    if selected_theme is None:
+        return {}
+    selected_name, colors = selected_theme
+    return {"theme": selected_name, "colors": colors}
+
+
+def diff_configs(
+    old_config: CachedConfig,
+    new_config: CachedConfig,
+    old_theme: str | None = None,
+    new_theme: str | None = None,
+) -> ConfigDiff:
+    variables = changed_variable_paths(
+        _mapping(old_config, "variables") | _theme_variables(old_config, old_theme),
+        _mapping(new_config, "variables") | _theme_variables(new_config, new_theme),
+    )
+    old_modules = _mapping(old_config, "dotfiles")
+    new_modules = _mapping(new_config, "dotfiles")
+    retargeted_modules = {
+        module_name
+        for module_name in old_modules.keys() & new_modules.keys()
+        if old_modules[module_name] is not new_modules[module_name]
+        and isinstance(module_name, str)
+        and isinstance(old_modules[module_name], dict)
+        and isinstance(new_modules[module_name], dict)
+        and module_target(module_name, old_modules[module_name])
+        != module_target(module_name, new_modules[module_name])
+    }
+    return ConfigDiff(
+        variables=frozenset(variables),
+        added_modules=frozenset(new_modules.keys() - old_modules.keys()),
+        removed_modules=frozenset(old_modules.keys() - new_modules.keys()),
+        retargeted_modules=frozenset(retargeted_modules),
+        library_changed=old_config.get("library_dir") != new_config.get("library_dir"),
+    )
+
+
 def resolve_theme(
     config: dict[str, Any],
     theme_name: str | None = None,
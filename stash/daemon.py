@@ -1,29 +1,37 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import Iterable
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import replace
 import fcntl
 from pathlib import Path
 import signal
-from typing import Any, TextIO
-
-from inotify.adapters import InotifyTree
-from inotify.constants import (
-    IN_CLOSE_WRITE,
-    IN_CREATE,
-    IN_DELETE,
-    IN_DELETE_SELF,
-    IN_MODIFY,
-    IN_MOVED_FROM,
-    IN_MOVED_TO,
-    IN_MOVE_SELF,
-)
+import time
+from typing import Any, TextIO, TypeVar
+
 import yaml
 
-from stash.config import load_config, resolve_theme, template_variables, theme_names
+from stash.actor import CancelToken, RenderActor, RenderCancelledError
+from stash.config import (
+    CachedConfig,
+    ConfigCache,
+    diff_configs,
+    theme_names,
+)
 from stash.dbus_service import DBusServiceError, start_dbus_service
 from stash.hooks import HookRunner
-from stash.live import DaemonError, LiveState, render_live
+from stash.ignore import IgnoreMatcher, load_ignore
+from stash.live import BYTECODE_CACHE_DIRECTORY, DaemonError, LiveState, render_live
+from stash.metrics import write_metrics
+from stash.pathindex import PathIndex
+from stash.reconcile import reconcile_live
+from stash.snapshot import restore_live, save_snapshot
+from stash.stats import StatsRecorder
+from stash.templates import TemplateBytecodeCache, TemplateMetadataCache
+from stash.tracing import Tracer
+from stash.watcher import Debounce, InotifyWatcher, coalesce_events
+
+T = TypeVar("T")
 
 
 _MUTATION_EVENT_NAMES = frozenset(
@@ -38,51 +46,52 @@ _MUTATION_EVENT_NAMES = frozenset(
         "IN_MOVE_SELF",
     }
 )
-_WATCH_MASK = (
-    IN_CLOSE_WRITE
-    | IN_CREATE
-    | IN_DELETE
-    | IN_DELETE_SELF
-    | IN_MODIFY
-    | IN_MOVED_FROM
-    | IN_MOVED_TO
-    | IN_MOVE_SELF
-)
-
-
-def _poll_events(watcher: InotifyTree) -> list[tuple[Any, ...]]:
-    events: list[tuple[Any, ...]] = []
-    for event in watcher.event_gen(timeout_s=0.25, yield_nones=False):
-        if event is not None:
-            events.append(event)
-    return events
 
 
 def _changed_paths(
     events: Iterable[tuple[Any, ...]],
     config_path: Path,
-    source_paths: Iterable[Path],
+    source_paths: PathIndex | Iterable[Path],
+    ignore: IgnoreMatcher | None = None,
 ) -> set[Path]:
+    if not isinstance(source_paths, PathIndex):
+        source_paths = PathIndex(source_paths)
     changed_paths: set[Path] = set()
+    resolved_config_path = config_path.resolve()
+    config_paths = {
+        resolved_config_path,
+        config_path.parent.resolve() / config_path.name,
+    }
     for _, event_names, watched_path, filename in events:
         if _MUTATION_EVENT_NAMES.isdisjoint(event_names):
             continue
-        changed_path = (Path(watched_path) / filename).resolve(strict=False)
-        if changed_path == config_path.resolve():
-            changed_paths.add(changed_path)
+        changed_path = Path(watched_path) / filename
+        if changed_path in config_paths:
+            changed_paths.add(resolved_config_path)
             continue
-        for source in source_paths:
-            if changed_path == source:
-                changed_paths.add(changed_path)
-                break
-            if changed_path.is_relative_to(source):
-                relative_path = changed_path.relative_to(source)
-                if not relative_path.parts or relative_path.parts[0] != ".git":
-                    changed_paths.add(changed_path)
-                    break
+        if ignore is not None and ignore.ignores(
+            changed_path, "IN_ISDIR" in event_names
+        ):
+            continue
+        match = source_paths.match(changed_path)
+        if match is not None and match[1].partition("/")[0] != ".git":
+            changed_paths.add(changed_path)
     return changed_paths
 
 
+def _overflowed(events: Iterable[tuple[Any, ...]]) -> bool:
+    return any("IN_Q_OVERFLOW" in event_names for _, event_names, _, _ in events)
+
+
+def _touches(events: Iterable[tuple[Any, ...]], paths: Iterable[Path]) -> bool:
+    paths = set(paths)
+    return any(
+        Path(watched_path) / filename in paths
+        for _, event_names, watched_path, filename in events
+        if not _MUTATION_EVENT_NAMES.isdisjoint(event_names)
+    )
+
+
 def _is_relevant(
     events: Iterable[tuple[Any, ...]],
     config_path: Path,
@@ -113,22 +122,67 @@ def _with_configured_sources(
         source_paths.update(
             (dotfiles / name).resolve() for name in modules if isinstance(name, str)
         )
-    return LiveState(
-        active_links=state.active_links,
-        module_names=state.module_names,
-        source_paths=frozenset(source_paths),
-        module_targets=state.module_targets,
-        templates=state.templates,
-    )
+    return replace(state, source_paths=frozenset(source_paths))
+
+
+class PendingUpdates:
+    def __init__(
+        self,
+        run_job: Callable[[Callable[[CancelToken], None], str], Awaitable[None]],
+        update_job: Callable[[set[Path], bool], Callable[[CancelToken], None]],
+    ) -> None:
+        self._run_job = run_job
+        self._update_job = update_job
+        self.paths: set[Path] = set()
+        self.full = False
+        self._tasks: set[asyncio.Task[None]] = set()
 
+    def schedule(self, changed_paths: set[Path], full: bool) -> asyncio.Task[None]:
+        self.paths.update(changed_paths)
+        self.full = self.full or full
+        task = asyncio.create_task(self._run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
 
-async def run_daemon(config_path: Path, dotfiles: Path, live_root: Path) -> None:
+    async def _run(self) -> None:
+        changed_paths = set(self.paths)
+        full = self.full
+        try:
+            await self._run_job(self._update_job(changed_paths, full), "update")
+        except RenderCancelledError:
+            return
+        except (DaemonError, OSError, ValueError, yaml.YAMLError) as exc:
+            print(f"Live update failed: {exc}")
+        else:
+            print("Live configuration updated")
+        self.paths.difference_update(changed_paths)
+        if full:
+            self.full = False
+
+
+async def run_daemon(
+    config_path: Path,
+    dotfiles: Path,
+    live_root: Path,
+    jobs: int = 1,
+    generations: bool = False,
+    metrics_path: Path | None = None,
+    trace_path: Path | None = None,
+    debounce: Debounce | None = None,
+) -> None:
+    debounce = debounce or Debounce()
     lock_file = _acquire_lock(live_root)
     state: LiveState | None = None
     bus = None
     stop_event = asyncio.Event()
-    active_config: dict[str, Any] | None = None
+    active_config: CachedConfig | None = None
     active_theme: str | None = None
+    config_cache = ConfigCache(config_path)
+    metadata_cache = TemplateMetadataCache()
+    ignore = load_ignore(dotfiles)
+    bytecode_cache = TemplateBytecodeCache(live_root / BYTECODE_CACHE_DIRECTORY)
+    stats = StatsRecorder(Tracer(trace_path) if trace_path is not None else None)
     loop = asyncio.get_running_loop()
     installed_signals: list[signal.Signals] = []
     for signal_name in (signal.SIGINT, signal.SIGTERM):
@@ -138,92 +192,220 @@ async def run_daemon(config_path: Path, dotfiles: Path, live_root: Path) -> None
         except NotImplementedError:
             pass
 
+    def load_daemon_config() -> CachedConfig:
+        with stats.phase("config_parse"):
+            return config_cache.load()
+
+    watcher = InotifyWatcher()
+    actor = RenderActor()
     try:
-        watchers = [InotifyTree(dotfiles.as_posix(), mask=_WATCH_MASK)]
-        if not config_path.resolve().is_relative_to(dotfiles.resolve()):
-            watchers.append(
-                InotifyTree(config_path.parent.as_posix(), mask=_WATCH_MASK)
-            )
+        watcher.add_watch(dotfiles.resolve())
+        watcher.add_watch(config_path.resolve().parent)
 
-        initial_config = load_config(config_path)
-        initial_theme = resolve_theme(initial_config)
+        initial_config = load_daemon_config()
+        initial_theme = initial_config.resolve_theme()
         active_theme = initial_theme[0] if initial_theme is not None else None
         active_config = initial_config
-        state = render_live(
-            initial_config,
+        state = restore_live(
+            initial_config.data,
             dotfiles,
             live_root,
             theme_name=active_theme,
+            jobs=jobs,
+            generations=generations,
+            metadata_cache=metadata_cache,
+            bytecode_cache=bytecode_cache,
+            stats=stats,
+            ignore=ignore,
         )
+        watcher.set_trees(state.source_paths)
 
         def apply_config(
-            config: dict[str, Any],
+            config: CachedConfig,
             requested_theme: str | None,
             fallback_if_missing: bool = False,
             changed_paths: set[Path] | None = None,
+            full: bool = False,
+            cancel: CancelToken | None = None,
         ) -> None:
             nonlocal active_config, active_theme, state
-            themes = config.get("themes")
-            if (
-                fallback_if_missing
-                and requested_theme is not None
-                and isinstance(themes, dict)
-                and requested_theme not in themes
-            ):
-                requested_theme = None
-            selected_theme = resolve_theme(config, requested_theme)
-            selected_name = selected_theme[0] if selected_theme is not None else None
-            changed_variables: set[str] | None = None
-            if active_config is not None:
-                old_template_variables = template_variables(
-                    active_config,
-                    dotfiles,
-                    active_theme,
+            started = time.perf_counter()
+            with stats.phase("apply_config"):
+                themes = config.get("themes")
+                if (
+                    fallback_if_missing
+                    and requested_theme is not None
+                    and isinstance(themes, dict)
+                    and requested_theme not in themes
+                ):
+                    requested_theme = None
+                selected_theme = config.resolve_theme(requested_theme)
+                selected_name = (
+                    selected_theme[0] if selected_theme is not None else None
                 )
-                new_template_variables = template_variables(
-                    config,
+                new_template_variables = config.template_variables(
                     dotfiles,
                     selected_name,
                 )
-                changed_variables = {
-                    name
-                    for name in set(old_template_variables)
-                    | set(new_template_variables)
-                    if old_template_variables.get(name)
-                    != new_template_variables.get(name)
-                }
-            state = render_live(
-                config,
-                dotfiles,
-                live_root,
-                state,
-                theme_name=selected_name,
-                changed_paths=changed_paths,
-                changed_variables=changed_variables,
-            )
-            active_config = config
-            active_theme = selected_name
+                config_diff = (
+                    None
+                    if active_config is None or full
+                    else diff_configs(
+                        active_config,
+                        config,
+                        active_theme,
+                        selected_name,
+                    )
+                )
+                previous_state = state
+                state = render_live(
+                    config.data,
+                    dotfiles,
+                    live_root,
+                    previous_state,
+                    theme_name=selected_name,
+                    changed_paths=None if full else changed_paths,
+                    jobs=jobs,
+                    generations=generations,
+                    metadata_cache=metadata_cache,
+                    bytecode_cache=bytecode_cache,
+                    stats=stats,
+                    ignore=ignore,
+                    config_diff=config_diff,
+                    cancel=cancel,
+                    variables=new_template_variables,
+                )
+                with stats.phase("snapshot"):
+                    save_snapshot(
+                        live_root,
+                        dotfiles,
+                        state,
+                        selected_name,
+                        new_template_variables,
+                        previous_state,
+                        changed_paths if changed_paths is not None else set(),
+                    )
+                active_config = config
+                active_theme = selected_name
+            stats.observe_latency("update", time.perf_counter() - started)
+
+        def reconcile() -> list[str]:
+            with stats.phase("reconcile"):
+                plan = reconcile_live(state, live_root)
+            if plan.outdated_templates:
+                apply_config(
+                    active_config,
+                    active_theme,
+                    changed_paths=set(plan.outdated_templates),
+                )
+            return plan.describe()
+
+        for change in reconcile():
+            print(f"Reconciled: {change}")
+
+        def update_live(
+            config: CachedConfig,
+            changed_paths: set[Path],
+            full: bool,
+            cancel: CancelToken,
+        ) -> None:
+            nonlocal state
+            metadata_cache.invalidate(changed_paths)
+            try:
+                with stats.span("update", changed_paths=len(changed_paths)):
+                    apply_config(
+                        config,
+                        active_theme,
+                        fallback_if_missing=True,
+                        changed_paths=changed_paths - {config_path.resolve()},
+                        full=full,
+                        cancel=cancel,
+                    )
+            except (DaemonError, OSError, ValueError):
+                state = _with_configured_sources(state, config.data, dotfiles)
+                raise
+
+        metrics_version: int | None = None
+
+        def publish_stats() -> None:
+            nonlocal metrics_version
+            if metrics_path is not None and stats.version != metrics_version:
+                metrics_version = stats.version
+                try:
+                    write_metrics(metrics_path, stats)
+                except OSError as exc:
+                    print(f"Could not write metrics: {exc}")
+            if stats.tracer is not None:
+                stats.tracer.flush()
+
+        async def run_job(job: Callable[[CancelToken], T], key: str | None = None) -> T:
+            try:
+                return await actor.run(job, key)
+            finally:
+                publish_stats()
+
+        def update_job(
+            changed_paths: set[Path],
+            full: bool,
+        ) -> Callable[[CancelToken], None]:
+            config = load_daemon_config()
+            return lambda cancel: update_live(config, changed_paths, full, cancel)
+
+        pending_updates = PendingUpdates(run_job, update_job)
+
+        requested_theme = active_theme
+
+        async def apply_requested_config(fallback_if_missing: bool) -> bool:
+            config = load_daemon_config()
+            theme = requested_theme
+            try:
+                await run_job(
+                    lambda cancel: apply_config(
+                        config,
+                        theme,
+                        fallback_if_missing=fallback_if_missing,
+                        cancel=cancel,
+                    ),
+                    key="config",
+                )
+            except RenderCancelledError:
+                return False
+            return True
 
         async def reload_handler() -> bool:
-            apply_config(
-                load_config(config_path),
-                active_theme,
-                fallback_if_missing=True,
-            )
+            if not await apply_requested_config(fallback_if_missing=True):
+                print("Reload was superseded by a newer request")
+                return False
             print("Live configuration updated")
             return True
 
         async def set_theme_handler(name: str) -> bool:
-            apply_config(load_config(config_path), name)
+            nonlocal requested_theme
+            requested_theme = name
+            try:
+                applied = await apply_requested_config(fallback_if_missing=False)
+            except BaseException:
+                if requested_theme == name:
+                    requested_theme = active_theme
+                raise
+            if not applied:
+                print(f"Theme change to {name} was superseded by a newer request")
+                return False
             print(f"Theme changed to {name}")
             return True
 
         async def list_themes_handler() -> list[str]:
-            return theme_names(load_config(config_path))
+            return theme_names(load_daemon_config().data)
 
         async def get_theme_handler() -> str:
             return active_theme or ""
 
+        async def reconcile_handler() -> list[str]:
+            return await run_job(lambda cancel: reconcile())
+
+        async def get_stats_handler() -> str:
+            return stats.dumps()
+
         try:
             bus = await start_dbus_service(
                 reload_handler,
@@ -231,46 +413,75 @@ async def run_daemon(config_path: Path, dotfiles: Path, live_root: Path) -> None
                 list_themes_handler,
                 get_theme_handler,
                 stop_event,
-                HookRunner(config_path, dotfiles, lambda: active_theme),
+                HookRunner(
+                    config_path,
+                    dotfiles,
+                    lambda: active_theme,
+                    bytecode_cache,
+                    stats,
+                    config_cache,
+                ),
+                reconcile_handler,
+                get_stats_handler,
             )
         except DBusServiceError as exc:
             raise DaemonError(str(exc)) from exc
         print(f"Watching {dotfiles} for changes; D-Bus name: org.dotstash.Stash")
+        publish_stats()
         while not stop_event.is_set():
-            changed = False
-            changed_paths: set[Path] = set()
-            for watcher in watchers:
-                events = await asyncio.to_thread(_poll_events, watcher)
-                watcher_paths = _changed_paths(events, config_path, state.source_paths)
-                if watcher_paths:
-                    changed = True
-                    changed_paths.update(watcher_paths)
+            watcher.set_trees(state.source_paths)
+            events = await watcher.read_events(stop_event)
             if stop_event.is_set():
                 break
-            if not changed:
+            stats.increment("inotify_events", len(events))
+            changed_paths = _changed_paths(
+                events, config_path, state.source_index, ignore
+            )
+            overflowed = _overflowed(events)
+            if (
+                not changed_paths
+                and not overflowed
+                and not _touches(events, ignore.sources)
+            ):
                 continue
-            await asyncio.sleep(0.1)
-            candidate_config: dict[str, Any] | None = None
-            try:
-                candidate_config = load_config(config_path)
-                apply_config(
-                    candidate_config,
-                    active_theme,
-                    fallback_if_missing=True,
-                    changed_paths=changed_paths - {config_path.resolve()},
+            if stats.tracer is not None:
+                stats.tracer.instant(
+                    "watch",
+                    events=len(events),
+                    changed_paths=sorted(map(str, changed_paths)),
                 )
-                print("Live configuration updated")
-            except (DaemonError, OSError, yaml.YAMLError) as exc:
-                if candidate_config is not None:
-                    state = _with_configured_sources(
-                        state,
-                        candidate_config,
-                        dotfiles,
-                    )
-                print(f"Live update failed: {exc}")
+            with stats.span("debounce"):
+                burst = await watcher.read_quiet(
+                    debounce.quiet,
+                    loop.time() + debounce.max_latency,
+                    stop_event,
+                )
+            if stop_event.is_set():
+                break
+            if burst:
+                stats.increment("inotify_events", len(burst))
+            events = coalesce_events(events + burst)
+            changed_paths = _changed_paths(
+                events, config_path, state.source_index, ignore
+            )
+            overflowed = overflowed or _overflowed(burst)
+            ignore_changed = _touches(events, ignore.sources)
+            if overflowed:
+                print("Inotify event queue overflowed; rendering everything")
+            elif ignore_changed:
+                print("Ignore patterns changed; rendering everything")
+            elif not changed_paths:
+                continue
+            if ignore_changed:
+                ignore = load_ignore(dotfiles)
+            pending_updates.schedule(changed_paths, overflowed or ignore_changed)
     finally:
         if bus is not None:
             bus.disconnect()
         for signal_name in installed_signals:
             loop.remove_signal_handler(signal_name)
+        watcher.close()
+        actor.close()
+        if stats.tracer is not None:
+            stats.tracer.close()
         lock_file.close()
@@ -137,12 +137,16 @@ class StashInterface(ServiceInterface):
         hook_runner: HookRunner,
         list_themes_handler: Callable[[], Awaitable[list[str]]] | None = None,
         get_theme_handler: Callable[[], Awaitable[str]] | None = None,
+        reconcile_handler: Callable[[], Awaitable[list[str]]] | None = None,
+        get_stats_handler: Callable[[], Awaitable[str]] | None = None,
     ) -> None:
         super().__init__(INTERFACE_NAME)
         self._reload_handler = reload_handler
         self._set_theme_handler = set_theme_handler
         self._list_themes_handler = list_themes_handler or _empty_theme_list
         self._get_theme_handler = get_theme_handler or _empty_theme_name
+        self._reconcile_handler = reconcile_handler or _empty_change_list
+        self._get_stats_handler = get_stats_handler or _empty_stats
         self._stop_event = stop_event
         self._hook_runner = hook_runner
 
@@ -173,6 +177,14 @@ class StashInterface(ServiceInterface):
     async def GetTheme(self) -> DBusStr:
         return await self._get_theme_handler()
 
+    @stash_dbus_method("Repair deployed links and live files")
+    async def Reconcile(self) -> DBusStrList:
+        return await self._reconcile_handler()
+
+    @stash_dbus_method("Get render timings and counters as JSON")
+    async def GetStats(self) -> DBusStr:
+        return await self._get_stats_handler()
+
     @stash_dbus_method("Stop the stash daemon")
     async def Stop(self) -> DBusBool:
         return self.stop()
@@ -185,6 +197,8 @@ async def start_dbus_service(
     get_theme_handler: Callable[[], Awaitable[str]],
     stop_event: asyncio.Event,
     hook_runner: HookRunner,
+    reconcile_handler: Callable[[], Awaitable[list[str]]] | None = None,
+    get_stats_handler: Callable[[], Awaitable[str]] | None = None,
 ) -> MessageBus:
     bus: MessageBus | None = None
     try:
@@ -198,6 +212,8 @@ async def start_dbus_service(
                 hook_runner,
                 list_themes_handler,
                 get_theme_handler,
+                reconcile_handler,
+                get_stats_handler,
             ),
         )
         reply = await bus.request_name(BUS_NAME)
@@ -223,6 +239,14 @@ async def _empty_theme_name() -> str:
     return ""
 
 
+async def _empty_change_list() -> list[str]:
+    return []
+
+
+async def _empty_stats() -> str:
+    return "{}"
+
+
 def get_dbus_commands() -> tuple[DBusCommand, ...]:
     commands: list[DBusCommand] = []
     for value in vars(StashInterface).values():
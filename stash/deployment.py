@@ -1,16 +1,63 @@
+import fcntl
+import os
 from pathlib import Path
+import shutil
+
+
+FICLONE = 0x40049409
 
 
 def atomic_symlink(link_path: Path, rendered_path: Path) -> None:
-    if link_path.exists() or link_path.is_symlink():
-        if link_path.is_dir() and not link_path.is_symlink():
+    try:
+        if os.readlink(link_path) == str(rendered_path):
+            return
+    except OSError:
+        if link_path.is_dir():
             raise IsADirectoryError(
                 f"Cannot replace directory at {link_path} with a symlink"
-            )
-        link_path.unlink()
+            ) from None
     link_path.parent.mkdir(parents=True, exist_ok=True)
     temp_link = link_path.with_name(f"{link_path.name}.tmp")
     if temp_link.exists() or temp_link.is_symlink():
         temp_link.unlink()
     temp_link.symlink_to(rendered_path)
     temp_link.replace(link_path)
+
+
+def _reflink(source_path: Path, destination: Path) -> bool:
+    try:
+        with source_path.open("rb") as source, destination.open("xb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    except OSError:
+        destination.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def _copy_file_range(source_path: Path, destination: Path) -> bool:
+    if not hasattr(os, "copy_file_range"):
+        return False
+    try:
+        with source_path.open("rb") as source, destination.open("xb") as target:
+            remaining = os.fstat(source.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+    except OSError:
+        destination.unlink(missing_ok=True)
+        return False
+    return remaining == 0
+
+
+def clone_file(source_path: Path, destination: Path) -> None:
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = destination.with_name(f".{destination.name}.tmp")
+    temporary_path.unlink(missing_ok=True)
+    if not _reflink(source_path, temporary_path) and not _copy_file_range(
+        source_path, temporary_path
+    ):
+        shutil.copyfile(source_path, temporary_path)
+    shutil.copymode(source_path, temporary_path)
+    temporary_path.replace(destination)
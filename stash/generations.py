@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+import os
+from pathlib import Path
+import shutil
+import threading
+import time
+
+
+GENERATIONS_DIRECTORY = ".generations"
+CURRENT_LINK = ".current"
+
+
+def current_generation(live_root: Path) -> Path | None:
+    current = live_root / CURRENT_LINK
+    if not current.is_symlink():
+        return None
+    return (live_root / os.readlink(current)).resolve(strict=False)
+
+
+def _hardlink_tree(source: Path, destination: Path) -> None:
+    for directory, directory_names, file_names in os.walk(source):
+        relative_directory = Path(directory).relative_to(source)
+        (destination / relative_directory).mkdir(parents=True, exist_ok=True)
+        for name in file_names:
+            if name.startswith(".") and name.endswith(".tmp"):
+                continue
+            os.link(
+                Path(directory) / name,
+                destination / relative_directory / name,
+                follow_symlinks=False,
+            )
+
+
+def _fsync(path: Path) -> None:
+    descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _module_directories(live_root: Path) -> list[Path]:
+    return sorted(
+        path
+        for path in live_root.iterdir()
+        if not path.name.startswith(".") and path.is_dir() and not path.is_symlink()
+    )
+
+
+def _generation_id(path: Path) -> int | None:
+    try:
+        return int(path.name.partition("-")[0])
+    except ValueError:
+        return None
+
+
+def _remove_generations(live_root: Path, keep: Path) -> None:
+    root = live_root / GENERATIONS_DIRECTORY
+    keep_id = _generation_id(keep)
+    try:
+        generations = list(root.iterdir())
+    except OSError:
+        return
+    for generation in generations:
+        generation_id = _generation_id(generation)
+        if (
+            generation != keep
+            and keep_id is not None
+            and generation_id is not None
+            and generation_id <= keep_id
+            and current_generation(live_root) != generation
+        ):
+            shutil.rmtree(generation, ignore_errors=True)
+
+
+class LiveGeneration:
+    def __init__(self, live_root: Path) -> None:
+        self.live_root = live_root
+        self.path = live_root / GENERATIONS_DIRECTORY / str(time.time_ns())
+        self.changed = False
+        self.written: set[Path] = set()
+        self._prepared = False
+
+    def output_root(self) -> Path:
+        if self._prepared:
+            return self.path
+        self.path.mkdir(parents=True)
+        previous = current_generation(self.live_root)
+        if previous is not None and previous.is_dir():
+            _hardlink_tree(previous, self.path)
+        else:
+            for module_directory in _module_directories(self.live_root):
+                _hardlink_tree(module_directory, self.path / module_directory.name)
+        self._prepared = True
+        return self.path
+
+    def mark_written(self, path: Path) -> None:
+        self.changed = True
+        self.written.add(path)
+
+    def _sync(self) -> None:
+        for path in self.written:
+            try:
+                _fsync(path)
+            except FileNotFoundError:
+                continue
+        for directory, _, _ in os.walk(self.path):
+            _fsync(Path(directory))
+        _fsync(self.path.parent)
+
+    def discard(self) -> None:
+        if self._prepared:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def commit(self, module_names: Iterable[str]) -> None:
+        module_names = set(module_names)
+        if not self._prepared:
+            return
+        if not self.changed and current_generation(self.live_root) is not None:
+            self.discard()
+            return
+
+        self._sync()
+        current = self.live_root / CURRENT_LINK
+        temporary_link = self.live_root / f"{CURRENT_LINK}.tmp"
+        temporary_link.unlink(missing_ok=True)
+        temporary_link.symlink_to(self.path.relative_to(self.live_root))
+        temporary_link.replace(current)
+        _fsync(self.live_root)
+
+        for index, module_name in enumerate(sorted(module_names)):
+            module_link = self.live_root / module_name
+            link_target = Path(CURRENT_LINK) / module_name
+            if module_link.is_symlink():
+                if Path(os.readlink(module_link)) == link_target:
+                    continue
+                module_link.unlink()
+            elif module_link.is_dir():
+                stale_path = self.path.with_name(f"{self.path.name}-{index}")
+                module_link.rename(stale_path)
+            module_link.symlink_to(link_target)
+        for path in self.live_root.iterdir():
+            if (
+                path.is_symlink()
+                and path.name not in module_names
+                and Path(os.readlink(path)).parent == Path(CURRENT_LINK)
+            ):
+                path.unlink()
+
+        threading.Thread(
+            target=_remove_generations,
+            args=(self.live_root, self.path),
+            name="stash-generation-cleanup",
+            daemon=True,
+        ).start()
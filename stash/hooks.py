@@ -7,11 +7,13 @@ from pathlib import Path
 import re
 import signal
 import sys
+import time
 from typing import Any, Callable
 
-from jinja2 import TemplateError
+from jinja2 import BytecodeCache, TemplateError
 
-from stash.config import load_config, template_variables
+from stash.config import CachedConfig, ConfigCache, library_root
+from stash.stats import StatsRecorder
 from stash.templates import template_environment
 
 
@@ -24,6 +26,10 @@ class HookError(RuntimeError):
     pass
 
 
+class HookTimeoutError(HookError):
+    pass
+
+
 def dbus_event_name(method_name: str) -> str:
     return _DBUS_WORD_BOUNDARY.sub("-", method_name).lower()
 
@@ -95,7 +101,7 @@ async def _run_script(
             except ProcessLookupError:
                 pass
             await process.wait()
-        raise HookError(
+        raise HookTimeoutError(
             f"Hook {script_path} exceeded the {HOOK_TIMEOUT_SECONDS:g} second timeout"
         ) from exc
     if process is None:
@@ -112,10 +118,16 @@ class HookRunner:
         config_path: Path,
         dotfiles: Path,
         active_theme: Callable[[], str | None] | None = None,
+        bytecode_cache: BytecodeCache | None = None,
+        stats: StatsRecorder | None = None,
+        config_cache: ConfigCache | None = None,
     ) -> None:
         self._config_path = config_path
+        self._config_cache = config_cache or ConfigCache(config_path)
         self._dotfiles = dotfiles
         self._active_theme = active_theme or (lambda: None)
+        self._bytecode_cache = bytecode_cache
+        self._stats = stats or StatsRecorder()
 
     async def run(
         self,
@@ -126,29 +138,53 @@ class HookRunner:
         if phase not in {"pre", "post"}:
             raise HookError(f"Unknown hook phase: {phase}")
         event = f"{phase}-{dbus_event_name(method_name)}"
-        config = load_config(self._config_path)
-        root = hooks_root(config, self._dotfiles)
+        with self._stats.phase("config_parse"):
+            config = self._config_cache.load()
+        root = hooks_root(config.data, self._dotfiles)
         scripts = discover_hooks(root, event)
         if not scripts:
             return
 
-        variables = template_variables(
-            config,
-            self._dotfiles,
-            self._active_theme(),
-        )
+        started = time.perf_counter()
+        try:
+            with self._stats.span("hooks", track="hooks", event=event):
+                await self._run_scripts(root, scripts, config, event, arguments)
+        except HookTimeoutError:
+            self._stats.increment("hook_timeouts")
+            raise
+        except HookError:
+            self._stats.increment("hook_failures")
+            raise
+        finally:
+            self._stats.observe("hooks", time.perf_counter() - started)
+            self._stats.increment("hooks_run", len(scripts))
+
+    async def _run_scripts(
+        self,
+        root: Path,
+        scripts: list[Path],
+        config: CachedConfig,
+        event: str,
+        arguments: dict[str, Any],
+    ) -> None:
+        variables = config.template_variables(self._dotfiles, self._active_theme())
         variables.update({"event": event, "arguments": arguments})
-        environment = template_environment(root)
+        environment = template_environment(
+            root,
+            self._bytecode_cache,
+            library_root(config.data, self._dotfiles),
+        )
         for script_path in scripts:
             template_name = script_path.relative_to(root).as_posix()
             try:
                 content = environment.get_template(template_name).render(variables)
             except (TemplateError, UnicodeDecodeError) as exc:
                 raise HookError(f"Could not render hook {script_path}: {exc}") from exc
-            await _run_script(
-                script_path,
-                content,
-                self._dotfiles,
-                event,
-                arguments,
-            )
+            with self._stats.span("hook", track="hooks", script=template_name):
+                await _run_script(
+                    script_path,
+                    content,
+                    self._dotfiles,
+                    event,
+                    arguments,
+                )
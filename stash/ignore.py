@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+import re
+
+
+IGNORE_FILES = (".gitignore", ".stashignore")
+EDITOR_PATTERNS = (
+    "*.swp",
+    "*.swo",
+    "*.swx",
+    ".*.sw?",
+    "*~",
+    "4913",
+    ".#*",
+    "#*#",
+    ".DS_Store",
+    ".git/",
+    "__pycache__/",
+)
+
+
+@dataclass(frozen=True)
+class IgnoreRule:
+    pattern: re.Pattern[str]
+    negated: bool
+    directory_only: bool
+
+
+def _translate(pattern: str) -> str:
+    parts: list[str] = []
+    index = 0
+    while index < len(pattern):
+        if pattern.startswith("**/", index) and (
+            index == 0 or pattern[index - 1] == "/"
+        ):
+            parts.append("(?:.*/)?")
+            index += 3
+        elif pattern.startswith("**", index) and index + 2 == len(pattern):
+            parts.append(".*")
+            index += 2
+        elif pattern[index] == "*":
+            parts.append("[^/]*")
+            index += 1
+        elif pattern[index] == "?":
+            parts.append("[^/]")
+            index += 1
+        elif pattern[index] == "[" and (end := pattern.find("]", index + 2)) != -1:
+            characters = pattern[index + 1 : end].replace("\\", "\\\\")
+            if characters.startswith("!"):
+                characters = f"^{characters[1:]}"
+            parts.append(f"[{characters}]")
+            index = end + 1
+        elif pattern[index] == "\\" and index + 1 < len(pattern):
+            parts.append(re.escape(pattern[index + 1]))
+            index += 2
+        else:
+            parts.append(re.escape(pattern[index]))
+            index += 1
+    return "".join(parts)
+
+
+def compile_rule(line: str) -> IgnoreRule | None:
+    pattern = line.rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    negated = pattern.startswith("!")
+    if negated:
+        pattern = pattern[1:]
+    elif pattern.startswith("\\"):
+        pattern = pattern[1:]
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    if not pattern:
+        return None
+    anchored = "/" in pattern
+    prefix = "" if anchored else "(?:.*/)?"
+    return IgnoreRule(
+        pattern=re.compile(f"{prefix}{_translate(pattern.lstrip('/'))}\\Z"),
+        negated=negated,
+        directory_only=directory_only,
+    )
+
+
+def _compile_rules(patterns: Iterable[str]) -> list[IgnoreRule]:
+    return [rule for rule in map(compile_rule, patterns) if rule is not None]
+
+
+class IgnoreMatcher:
+    def __init__(self, root: Path, patterns: Iterable[str] = ()) -> None:
+        self.root = root
+        self.sources = tuple(root / name for name in IGNORE_FILES)
+        self._editor_rules = _compile_rules(EDITOR_PATTERNS)
+        self._rules = [*self._editor_rules, *_compile_rules(patterns)]
+        self._directories: dict[str, bool] = {}
+
+    def _matches(
+        self,
+        relative_path: str,
+        is_dir: bool,
+        rules: list[IgnoreRule] | None = None,
+    ) -> bool:
+        for rule in reversed(rules or self._rules):
+            if (is_dir or not rule.directory_only) and rule.pattern.match(
+                relative_path
+            ):
+                return not rule.negated
+        return False
+
+    def _ignores_directory(self, relative_path: str) -> bool:
+        ignored = self._directories.get(relative_path)
+        if ignored is None:
+            parent, _, _ = relative_path.rpartition("/")
+            ignored = self._directories[relative_path] = (
+                bool(parent) and self._ignores_directory(parent)
+            ) or self._matches(relative_path, True)
+        return ignored
+
+    def ignores(self, path: Path, is_dir: bool = False) -> bool:
+        if not path.is_relative_to(self.root):
+            return self._matches(path.name, is_dir, self._editor_rules)
+        relative_path = path.relative_to(self.root).as_posix()
+        if relative_path == ".":
+            return False
+        parent, _, _ = relative_path.rpartition("/")
+        if parent and self._ignores_directory(parent):
+            return True
+        if is_dir:
+            return self._ignores_directory(relative_path)
+        return self._matches(relative_path, False)
+
+
+def load_ignore(root: Path) -> IgnoreMatcher:
+    root = root.resolve()
+    patterns: list[str] = []
+    for name in IGNORE_FILES:
+        try:
+            patterns.extend((root / name).read_text().splitlines())
+        except (OSError, UnicodeDecodeError):
+            continue
+    return IgnoreMatcher(root, patterns)
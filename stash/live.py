@@ -1,21 +1,41 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import cached_property
+import hashlib
+from itertools import chain, repeat
 from pathlib import Path
 import shutil
+import time
 from typing import Any
 
-from stash.config import module_target, template_variables
-from stash.deployment import atomic_symlink
+from stash.actor import CancelToken, RenderCancelledError
+from stash.config import ConfigDiff, library_root, module_target, template_variables
+from stash.deployment import atomic_symlink, clone_file
+from stash.generations import LiveGeneration
+from stash.ignore import IgnoreMatcher, load_ignore
+from stash.manifest import LiveManifest, content_digest, file_digest
+from stash.pathindex import PathIndex
+from stash.stats import StatsRecorder
 from stash.templates import (
     RenderedTemplate,
+    TemplateBytecodeCache,
     TemplateMetadata,
+    TemplateMetadataCache,
     TemplateRenderError,
+    TemplateStream,
     render_templates,
+    stream_templates,
     template_metadata,
 )
 
 
+BYTECODE_CACHE_DIRECTORY = ".cache/bytecode"
+STREAM_BUFFER_SIZE = 1024 * 1024
+
+
 class DaemonError(RuntimeError):
     pass
 
@@ -30,15 +50,115 @@ class LiveTemplate:
     variable_names: frozenset[str]
     dependency_names: frozenset[str]
     has_dynamic_dependencies: bool
+    variable_paths: frozenset[str] = frozenset()
+    traced_dependency_names: frozenset[str] | None = None
+    is_binary: bool = False
+
+
+@dataclass(frozen=True)
+class LiveModule:
+    source_path: Path
+    templates: dict[str, LiveTemplate]
+    link_paths: frozenset[Path]
+    dependency_names: frozenset[str]
+    has_untraced_dependencies: bool
+    variable_templates: dict[str, frozenset[str]]
 
 
 @dataclass(frozen=True)
 class LiveState:
-    active_links: frozenset[Path]
     module_names: frozenset[str]
     source_paths: frozenset[Path]
     module_targets: dict[str, Path]
-    templates: dict[Path, LiveTemplate]
+    modules: dict[str, LiveModule]
+    library_path: Path | None = None
+    library_templates: dict[str, TemplateMetadata] = field(default_factory=dict)
+
+    @cached_property
+    def templates(self) -> dict[Path, LiveTemplate]:
+        return {
+            template.source_path / name: template
+            for module in self.modules.values()
+            for name, template in module.templates.items()
+        }
+
+    @cached_property
+    def source_index(self) -> PathIndex:
+        return PathIndex(self.source_paths)
+
+    @cached_property
+    def active_links(self) -> frozenset[Path]:
+        return frozenset().union(
+            *(module.link_paths for module in self.modules.values())
+        )
+
+    def dependent_modules(self, names: Iterable[str]) -> set[str]:
+        names = set(names)
+        return {
+            module_name
+            for module_name, module in self.modules.items()
+            if module.has_untraced_dependencies
+            or not module.dependency_names.isdisjoint(names)
+        }
+
+
+def live_module(source_path: Path, templates: dict[str, LiveTemplate]) -> LiveModule:
+    dependency_names: set[str] = set()
+    has_untraced_dependencies = False
+    variable_templates: dict[str, set[str]] = {}
+    for name, template in templates.items():
+        dependency_names.update(template.dependency_names)
+        if template.has_dynamic_dependencies:
+            if template.traced_dependency_names is None:
+                has_untraced_dependencies = True
+            else:
+                dependency_names.update(template.traced_dependency_names)
+        for variable_name in template.variable_names:
+            variable_templates.setdefault(variable_name, set()).add(name)
+    return LiveModule(
+        source_path=source_path,
+        templates=templates,
+        link_paths=frozenset(template.link_path for template in templates.values()),
+        dependency_names=frozenset(dependency_names),
+        has_untraced_dependencies=has_untraced_dependencies,
+        variable_templates={
+            name: frozenset(template_names)
+            for name, template_names in variable_templates.items()
+        },
+    )
+
+
+@dataclass(frozen=True)
+class _LiveRender:
+    dotfiles: Path
+    live_root: Path
+    variables: dict[str, Any]
+    manifest: LiveManifest
+    bytecode_cache: TemplateBytecodeCache
+    metadata_cache: TemplateMetadataCache
+    jobs: int = 1
+    library: Path | None = None
+    generation: LiveGeneration | None = None
+    stats: StatsRecorder = field(default_factory=StatsRecorder)
+    ignore: IgnoreMatcher | None = None
+    cancel: CancelToken | None = None
+
+    def check_cancelled(self) -> None:
+        if self.cancel is not None:
+            self.cancel.check()
+
+    def output_path(self, module_name: str, relative_path: Path = Path()) -> Path:
+        if self.generation is None:
+            return self.live_root / module_name / relative_path
+        return self.generation.output_root() / module_name / relative_path
+
+    def mark_changed(self, written_path: Path | None = None) -> None:
+        if self.generation is None:
+            return
+        if written_path is None:
+            self.generation.changed = True
+        else:
+            self.generation.mark_written(written_path)
 
 
 def _points_into(path: Path, root: Path) -> bool:
@@ -62,32 +182,231 @@ def _remove_empty_directories(path: Path, stop: Path) -> None:
         current = current.parent
 
 
-def _write_live_file(live_path: Path, content: str) -> None:
+def _temporary_live_path(live_path: Path) -> Path:
+    return live_path.with_name(f".{live_path.name}.tmp")
+
+
+def _write_temporary_file(
+    live_path: Path,
+    content: str | Iterable[str],
+) -> Path:
     live_path.parent.mkdir(parents=True, exist_ok=True)
-    temporary_path = live_path.with_name(f".{live_path.name}.tmp")
-    temporary_path.write_text(content)
-    temporary_path.replace(live_path)
+    temporary_path = _temporary_live_path(live_path)
+    try:
+        with temporary_path.open("w") as handle:
+            if isinstance(content, str):
+                handle.write(content)
+            else:
+                handle.writelines(content)
+    except BaseException:
+        temporary_path.unlink(missing_ok=True)
+        raise
+    return temporary_path
+
+
+def _write_live_file(live_path: Path, content: str | Iterable[str]) -> None:
+    _write_temporary_file(live_path, content).replace(live_path)
+
+
+def _hashed_chunks(chunks: Iterable[str], digest: Any) -> Iterator[str]:
+    for chunk in chunks:
+        digest.update(chunk.encode())
+        yield chunk
+
+
+def _deploy_stream(
+    render: _LiveRender,
+    module_name: str,
+    relative_path: Path,
+    link_path: Path,
+    chunks: Iterable[str],
+) -> None:
+    render.check_cancelled()
+    with render.stats.span(
+        "template", module=module_name, path=relative_path.as_posix()
+    ):
+        _deploy_chunks(render, module_name, relative_path, link_path, chunks)
+
+
+def _deploy_chunks(
+    render: _LiveRender,
+    module_name: str,
+    relative_path: Path,
+    link_path: Path,
+    chunks: Iterable[str],
+) -> None:
+    chunks = render.stats.timed("render", chunks)
+    buffered: list[str] = []
+    buffered_size = 0
+    try:
+        for chunk in chunks:
+            buffered.append(chunk)
+            buffered_size += len(chunk)
+            if buffered_size >= STREAM_BUFFER_SIZE:
+                break
+        else:
+            _deploy_output(
+                render, module_name, relative_path, link_path, "".join(buffered)
+            )
+            return
+
+        output_path = render.output_path(module_name, relative_path)
+        digest = hashlib.sha256()
+        with render.stats.phase(
+            "write", module=module_name, path=relative_path.as_posix()
+        ):
+            temporary_path = _write_temporary_file(
+                output_path, _hashed_chunks(chain(buffered, chunks), digest)
+            )
+    except TemplateRenderError as exc:
+        raise DaemonError(str(exc)) from exc
+
+    render.stats.increment("templates_rendered")
+    if render.manifest.is_current(
+        module_name, relative_path, output_path, digest.hexdigest()
+    ):
+        temporary_path.unlink()
+        render.stats.increment("files_skipped")
+    else:
+        with render.stats.phase(
+            "write", module=module_name, path=relative_path.as_posix()
+        ):
+            temporary_path.replace(output_path)
+        render.stats.increment("files_written")
+        render.mark_changed(output_path)
+    _link_output(
+        render, module_name, relative_path, link_path, output_path, digest.hexdigest()
+    )
+
+
+def _deploy_output(
+    render: _LiveRender,
+    module_name: str,
+    relative_path: Path,
+    link_path: Path,
+    content: str,
+) -> None:
+    render.check_cancelled()
+    manifest = render.manifest
+    output_path = render.output_path(module_name, relative_path)
+    digest = content_digest(content)
+    render.stats.increment("templates_rendered")
+    if manifest.is_current(module_name, relative_path, output_path, digest):
+        render.stats.increment("files_skipped")
+    else:
+        with render.stats.phase(
+            "write", module=module_name, path=relative_path.as_posix()
+        ):
+            _write_live_file(output_path, content)
+        render.stats.increment("files_written")
+        render.mark_changed(output_path)
+    _link_output(render, module_name, relative_path, link_path, output_path, digest)
+
+
+def _deploy_file(
+    render: _LiveRender,
+    module_name: str,
+    source_path: Path,
+    relative_path: Path,
+    link_path: Path,
+) -> None:
+    render.check_cancelled()
+    manifest = render.manifest
+    output_path = render.output_path(module_name, relative_path)
+    digest = file_digest(source_path)
+    if manifest.is_current(module_name, relative_path, output_path, digest):
+        render.stats.increment("files_skipped")
+    else:
+        with render.stats.phase(
+            "write", module=module_name, path=relative_path.as_posix()
+        ):
+            clone_file(source_path, output_path)
+        render.stats.increment("files_written")
+        render.mark_changed(output_path)
+    _link_output(render, module_name, relative_path, link_path, output_path, digest)
 
 
-def _load_module_templates(source: Path) -> dict[str, TemplateMetadata]:
+def _link_output(
+    render: _LiveRender,
+    module_name: str,
+    relative_path: Path,
+    link_path: Path,
+    output_path: Path,
+    digest: str,
+) -> None:
+    manifest = render.manifest
+    live_path = render.live_root / module_name / relative_path
+    if manifest.is_linked(module_name, relative_path, link_path, live_path):
+        render.stats.increment("links_skipped")
+    else:
+        with render.stats.phase("symlink", link=link_path.as_posix()):
+            atomic_symlink(link_path, live_path)
+        render.stats.increment("links_updated")
+    manifest.record(module_name, relative_path, output_path, link_path, digest)
+
+
+def _remove_live_output(
+    render: _LiveRender,
+    module_name: str,
+    relative_path: Path,
+) -> None:
+    output_path = render.output_path(module_name, relative_path)
+    if output_path.exists():
+        output_path.unlink()
+        _remove_empty_directories(output_path.parent, render.output_path(module_name))
+        render.mark_changed()
+    render.manifest.discard(module_name, relative_path)
+
+
+def _remove_live_module(render: _LiveRender, module_name: str) -> None:
+    stale_path = render.output_path(module_name)
+    if stale_path.exists():
+        shutil.rmtree(stale_path)
+        render.mark_changed()
+    render.manifest.remove_module(module_name)
+
+
+def _load_module_templates(
+    source: Path,
+    metadata_cache: TemplateMetadataCache | None = None,
+    ignore: IgnoreMatcher | None = None,
+) -> dict[str, TemplateMetadata]:
     if not source.is_dir():
         raise DaemonError(f"Dotfile module does not exist: {source}")
     try:
-        templates = template_metadata(source)
+        templates = template_metadata(source, metadata_cache, ignore)
     except TemplateRenderError as exc:
         raise DaemonError(str(exc)) from exc
     if not templates:
-        raise DaemonError(f"Dotfile module has no text templates: {source}")
+        raise DaemonError(f"Dotfile module has no files: {source}")
     return templates
 
 
+def _load_library_templates(
+    library: Path | None,
+    metadata_cache: TemplateMetadataCache | None = None,
+    ignore: IgnoreMatcher | None = None,
+) -> dict[str, TemplateMetadata]:
+    if library is None or not library.is_dir():
+        return {}
+    try:
+        return template_metadata(library, metadata_cache, ignore)
+    except TemplateRenderError as exc:
+        raise DaemonError(str(exc)) from exc
+
+
 def _render_module_templates(
     source: Path,
     variables: dict[str, Any],
     selected: set[str] | None = None,
+    bytecode_cache: TemplateBytecodeCache | None = None,
+    templates: dict[str, TemplateMetadata] | None = None,
+    library: Path | None = None,
 ) -> list[RenderedTemplate]:
     try:
-        return render_templates(source, variables, selected)
+        return render_templates(
+            source, variables, selected, bytecode_cache, templates, library
+        )
     except TemplateRenderError as exc:
         raise DaemonError(str(exc)) from exc
 
@@ -97,6 +416,7 @@ def _template_state(
     source_path: Path,
     target_path: Path,
     metadata: TemplateMetadata,
+    traced_dependency_names: frozenset[str] | None = None,
 ) -> LiveTemplate:
     return LiveTemplate(
         module_name=module_name,
@@ -107,100 +427,272 @@ def _template_state(
         variable_names=metadata.variable_names,
         dependency_names=metadata.dependency_names,
         has_dynamic_dependencies=metadata.has_dynamic_dependencies,
+        variable_paths=metadata.variable_paths,
+        traced_dependency_names=traced_dependency_names,
+        is_binary=metadata.is_binary,
     )
 
 
+def _render_module(
+    source: Path,
+    variables: dict[str, Any],
+    bytecode_cache: TemplateBytecodeCache,
+    metadata_cache: TemplateMetadataCache | None = None,
+    library: Path | None = None,
+    ignore: IgnoreMatcher | None = None,
+) -> tuple[dict[str, TemplateMetadata], list[RenderedTemplate]]:
+    metadata_by_name = _load_module_templates(source, metadata_cache, ignore)
+    rendered_templates = _render_module_templates(
+        source,
+        variables,
+        set(metadata_by_name),
+        bytecode_cache,
+        metadata_by_name,
+        library,
+    )
+    return metadata_by_name, rendered_templates
+
+
+def _stream_module_templates(
+    source: Path,
+    metadata_by_name: dict[str, TemplateMetadata],
+    render: _LiveRender,
+) -> Iterator[TemplateStream]:
+    try:
+        yield from stream_templates(
+            source,
+            render.variables,
+            set(metadata_by_name),
+            render.bytecode_cache,
+            metadata_by_name,
+            render.library,
+        )
+    except TemplateRenderError as exc:
+        raise DaemonError(str(exc)) from exc
+
+
+def _render_modules(
+    sources: list[Path],
+    render: _LiveRender,
+) -> Iterator[
+    tuple[
+        dict[str, TemplateMetadata],
+        Iterable[RenderedTemplate | TemplateStream],
+    ]
+]:
+    if render.jobs <= 1 or len(sources) <= 1:
+        for source in sources:
+            with render.stats.phase("metadata_scan", module=source.name):
+                metadata_by_name = _load_module_templates(
+                    source, render.metadata_cache, render.ignore
+                )
+            yield (
+                metadata_by_name,
+                _stream_module_templates(source, metadata_by_name, render),
+            )
+        return
+    with ProcessPoolExecutor(max_workers=min(render.jobs, len(sources))) as executor:
+        yield from render.stats.timed(
+            "render",
+            executor.map(
+                _render_module,
+                sources,
+                repeat(render.variables),
+                repeat(render.bytecode_cache),
+                repeat(None),
+                repeat(render.library),
+                repeat(render.ignore),
+            ),
+        )
+
+
 def _state_from_modules(
     modules: dict[str, dict[str, Any]],
-    dotfiles: Path,
-    live_root: Path,
-    variables: dict[str, Any],
+    render: _LiveRender,
 ) -> LiveState:
-    templates: dict[Path, LiveTemplate] = {}
+    dotfiles = render.dotfiles
+    live_modules: dict[str, LiveModule] = {}
     module_targets: dict[str, Path] = {}
+    sources: list[Path] = []
 
     for module_name, module_config in modules.items():
         if not isinstance(module_name, str) or not isinstance(module_config, dict):
             raise DaemonError("Every dotfile module must be a mapping")
-        source = (dotfiles / module_name).resolve()
-        target = module_target(module_name, module_config)
-        module_targets[module_name] = target
-        metadata_by_name = _load_module_templates(source)
-        rendered_templates = _render_module_templates(
+        sources.append((dotfiles / module_name).resolve())
+        module_targets[module_name] = module_target(module_name, module_config)
+
+    for module_name, source, (metadata_by_name, rendered_templates) in zip(
+        module_targets, sources, _render_modules(sources, render)
+    ):
+        target = module_targets[module_name]
+        traces: dict[str, frozenset[str]] = {}
+        for rendered in render.stats.timed("render", rendered_templates):
+            _deploy_stream(
+                render,
+                module_name,
+                rendered.metadata.relative_path,
+                target / rendered.metadata.relative_path,
+                (
+                    rendered
+                    if isinstance(rendered, TemplateStream)
+                    else [rendered.content]
+                ),
+            )
+            traces[rendered.metadata.template_name] = rendered.loaded_names
+        for metadata in metadata_by_name.values():
+            if metadata.is_binary:
+                _deploy_file(
+                    render,
+                    module_name,
+                    source / metadata.template_name,
+                    metadata.relative_path,
+                    target / metadata.relative_path,
+                )
+        live_modules[module_name] = live_module(
             source,
-            variables,
-            set(metadata_by_name),
+            {
+                name: _template_state(
+                    module_name,
+                    source,
+                    target,
+                    metadata,
+                    traces.get(name),
+                )
+                for name, metadata in metadata_by_name.items()
+            },
         )
-        for rendered in rendered_templates:
-            live_path = live_root / module_name / rendered.metadata.relative_path
-            _write_live_file(live_path, rendered.content)
-            atomic_symlink(target / rendered.metadata.relative_path, live_path)
-        for metadata in metadata_by_name.values():
-            template_path = source / metadata.template_name
-            templates[template_path] = _template_state(
-                module_name, source, target, metadata
-            )
 
+    with render.stats.phase("metadata_scan"):
+        library_templates = _load_library_templates(
+            render.library, render.metadata_cache, render.ignore
+        )
     return LiveState(
-        active_links=frozenset(template.link_path for template in templates.values()),
         module_names=frozenset(modules),
-        source_paths=frozenset((dotfiles / name).resolve() for name in modules),
+        source_paths=_source_paths(dotfiles, modules, render.library),
         module_targets=module_targets,
-        templates=templates,
+        modules=live_modules,
+        library_path=render.library,
+        library_templates=library_templates,
     )
 
 
-def _module_templates(
-    templates: dict[Path, LiveTemplate],
-    module_name: str,
-) -> dict[str, LiveTemplate]:
-    return {
-        template.template_name: template
-        for template in templates.values()
-        if template.module_name == module_name
+def _source_paths(
+    dotfiles: Path,
+    module_names: Iterable[str],
+    library: Path | None,
+) -> frozenset[Path]:
+    source_paths = {(dotfiles / name).resolve() for name in module_names}
+    if library is not None:
+        source_paths.add(library)
+    return frozenset(source_paths)
+
+
+def _remove_stale_outputs(
+    previous_state: LiveState,
+    next_state: LiveState,
+    render: _LiveRender,
+) -> None:
+    current_outputs = {
+        (template.module_name, template.relative_path)
+        for template in next_state.templates.values()
     }
+    for template in previous_state.templates.values():
+        if template.link_path not in next_state.active_links:
+            _remove_live_link(template.link_path, render.live_root)
+        if template.module_name not in next_state.module_names:
+            continue
+        if (template.module_name, template.relative_path) not in current_outputs:
+            _remove_live_output(
+                render,
+                template.module_name,
+                template.relative_path,
+            )
+    for module_name in previous_state.module_names - next_state.module_names:
+        _remove_live_module(render, module_name)
 
 
 def _module_reverse_dependencies(
     old_templates: dict[str, LiveTemplate],
     new_templates: dict[str, TemplateMetadata],
+    library_names: Iterable[str] = (),
 ) -> dict[str, set[str]]:
-    reverse_dependencies: dict[str, set[str]] = {
-        name: set() for name in set(old_templates) | set(new_templates)
-    }
-    has_dynamic_dependencies = any(
-        template.has_dynamic_dependencies for template in old_templates.values()
-    ) or any(template.has_dynamic_dependencies for template in new_templates.values())
-    if has_dynamic_dependencies:
-        names = set(reverse_dependencies)
-        return {name: set(names) for name in names}
+    names = set(old_templates) | set(new_templates) | set(library_names)
+    reverse_dependencies: dict[str, set[str]] = {name: set() for name in names}
 
-    for name, template in old_templates.items():
-        for dependency in template.dependency_names:
+    def add_dependencies(name: str, dependencies: Iterable[str]) -> None:
+        for dependency in dependencies:
             reverse_dependencies.setdefault(dependency, set()).add(name)
+
+    for name, template in old_templates.items():
+        add_dependencies(name, template.dependency_names)
+        if template.has_dynamic_dependencies:
+            traced_dependency_names = template.traced_dependency_names
+            add_dependencies(
+                name,
+                names if traced_dependency_names is None else traced_dependency_names,
+            )
     for name, template in new_templates.items():
-        for dependency in template.dependency_names:
-            reverse_dependencies.setdefault(dependency, set()).add(name)
+        add_dependencies(name, template.dependency_names)
+        old_template = old_templates.get(name)
+        if template.has_dynamic_dependencies and (
+            old_template is None or old_template.traced_dependency_names is None
+        ):
+            add_dependencies(name, names)
     return reverse_dependencies
 
 
+def _variable_path_prefixes(path: str) -> Iterator[str]:
+    parts = path.split(".")
+    for index in range(1, len(parts) + 1):
+        yield ".".join(parts[:index])
+
+
+def _uses_changed_variables(
+    paths: frozenset[str],
+    changed_variables: set[str],
+    changed_prefixes: set[str],
+) -> bool:
+    return any(
+        path in changed_prefixes
+        or not changed_variables.isdisjoint(_variable_path_prefixes(path))
+        for path in paths
+    )
+
+
+def _variable_template_names(
+    module: LiveModule,
+    changed_variables: set[str],
+    changed_prefixes: set[str],
+) -> set[str]:
+    candidates: set[str] = set()
+    for path in changed_variables:
+        candidates.update(module.variable_templates.get(path.split(".", 1)[0], ()))
+    return {
+        name
+        for name in candidates
+        if _uses_changed_variables(
+            module.templates[name].variable_paths
+            or module.templates[name].variable_names,
+            changed_variables,
+            changed_prefixes,
+        )
+    }
+
+
 def _affected_template_names(
     old_templates: dict[str, LiveTemplate],
     new_templates: dict[str, TemplateMetadata],
     changed_names: set[str],
-    changed_variables: set[str],
     target_changed: bool,
+    library_names: set[str] | None = None,
 ) -> set[str]:
-    affected = set(changed_names)
+    library_names = library_names or set()
+    affected = set(changed_names) | library_names
     if target_changed:
         affected.update(new_templates)
-    if changed_variables:
-        affected.update(
-            name
-            for name, template in old_templates.items()
-            if not changed_variables.isdisjoint(template.variable_names)
-        )
-    reverse_dependencies = _module_reverse_dependencies(old_templates, new_templates)
+    reverse_dependencies = _module_reverse_dependencies(
+        old_templates, new_templates, library_names
+    )
     pending = list(affected)
     while pending:
         name = pending.pop()
@@ -209,7 +701,7 @@ def _affected_template_names(
                 continue
             affected.add(dependent)
             pending.append(dependent)
-    return affected
+    return affected - library_names
 
 
 def _rebuild_state(
@@ -217,34 +709,121 @@ def _rebuild_state(
     modules: dict[str, dict[str, Any]],
     dotfiles: Path,
     new_metadata: dict[str, dict[str, TemplateMetadata]],
+    rendered_by_module: dict[str, list[RenderedTemplate]],
+    library_templates: dict[str, TemplateMetadata],
 ) -> LiveState:
-    templates = {
-        path: template
-        for path, template in previous_state.templates.items()
-        if template.module_name in modules and template.module_name not in new_metadata
-    }
     module_targets = {
         module_name: module_target(module_name, module_config)
         for module_name, module_config in modules.items()
         if isinstance(module_name, str) and isinstance(module_config, dict)
     }
+    live_modules = {
+        module_name: module
+        for module_name, module in previous_state.modules.items()
+        if module_name in module_targets and module_name not in new_metadata
+    }
 
     for module_name, metadata_by_name in new_metadata.items():
         source = (dotfiles / module_name).resolve()
         target = module_targets[module_name]
-        for metadata in metadata_by_name.values():
-            template_path = source / metadata.template_name
-            templates[template_path] = _template_state(
-                module_name, source, target, metadata
+        previous_module = previous_state.modules.get(module_name)
+        previous_templates = (
+            {} if previous_module is None else previous_module.templates
+        )
+        traces = {
+            rendered.metadata.template_name: rendered.loaded_names
+            for rendered in rendered_by_module.get(module_name, [])
+        }
+        templates: dict[str, LiveTemplate] = {}
+        for name, metadata in metadata_by_name.items():
+            traced_dependency_names = traces.get(name)
+            previous_template = previous_templates.get(name)
+            if traced_dependency_names is None and previous_template is not None:
+                traced_dependency_names = previous_template.traced_dependency_names
+            templates[name] = _template_state(
+                module_name, source, target, metadata, traced_dependency_names
             )
+        live_modules[module_name] = live_module(source, templates)
 
+    source_paths = {module.source_path for module in live_modules.values()}
+    if previous_state.library_path is not None:
+        source_paths.add(previous_state.library_path)
     return LiveState(
-        active_links=frozenset(template.link_path for template in templates.values()),
         module_names=frozenset(module_targets),
-        source_paths=frozenset((dotfiles / name).resolve() for name in module_targets),
+        source_paths=frozenset(source_paths),
         module_targets=module_targets,
-        templates=templates,
+        modules=live_modules,
+        library_path=previous_state.library_path,
+        library_templates=library_templates,
+    )
+
+
+def _changed_names_by_source(
+    changed_paths: set[Path],
+    source_index: PathIndex,
+) -> dict[Path, set[str]]:
+    changed_names = source_index.group(
+        path for path in changed_paths if not path.is_dir()
     )
+    for names in changed_names.values():
+        names.discard("")
+    return changed_names
+
+
+def _library_changes(
+    previous_state: LiveState,
+    changed_names_by_source: dict[Path, set[str]],
+    changed_variables: set[str],
+    changed_prefixes: set[str],
+    metadata_cache: TemplateMetadataCache | None = None,
+    ignore: IgnoreMatcher | None = None,
+) -> tuple[dict[str, TemplateMetadata], set[str], set[str]]:
+    library = previous_state.library_path
+    if library is None:
+        return previous_state.library_templates, set(), set()
+    changed_names = set(changed_names_by_source.get(library, ()))
+    library_templates = previous_state.library_templates
+    if changed_names:
+        library_templates = _load_library_templates(library, metadata_cache, ignore)
+    if changed_variables:
+        changed_names.update(
+            name
+            for name, metadata in library_templates.items()
+            if _uses_changed_variables(
+                metadata.variable_paths or metadata.variable_names,
+                changed_variables,
+                changed_prefixes,
+            )
+        )
+    if not changed_names:
+        return library_templates, set(), set()
+
+    changed_library_names = _affected_template_names(
+        {},
+        previous_state.library_templates | library_templates,
+        changed_names,
+        False,
+    )
+    return (
+        library_templates,
+        changed_library_names,
+        previous_state.dependent_modules(changed_library_names),
+    )
+
+
+def _module_metadata(module: LiveModule) -> dict[str, TemplateMetadata]:
+    return {
+        name: TemplateMetadata(
+            template_name=template.template_name,
+            relative_path=template.relative_path,
+            variable_names=template.variable_names,
+            dependency_names=template.dependency_names,
+            has_dynamic_dependencies=template.has_dynamic_dependencies,
+            variable_paths=template.variable_paths,
+            is_binary=template.is_binary,
+        )
+        for name, template in module.templates.items()
+    }
 
 
 def _module_changes(
@@ -253,62 +832,108 @@ def _module_changes(
     dotfiles: Path,
     changed_paths: set[Path],
     changed_variables: set[str],
-) -> tuple[dict[str, set[str]], dict[str, dict[str, TemplateMetadata]], set[str]]:
+    metadata_cache: TemplateMetadataCache | None = None,
+    ignore: IgnoreMatcher | None = None,
+    config_diff: ConfigDiff | None = None,
+) -> tuple[
+    dict[str, set[str]],
+    dict[str, dict[str, TemplateMetadata]],
+    set[str],
+    dict[str, TemplateMetadata],
+]:
     affected_names: dict[str, set[str]] = {}
     new_metadata: dict[str, dict[str, TemplateMetadata]] = {}
-    removed_modules = previous_state.module_names - set(modules)
     current_modules = {
         module_name
         for module_name, module_config in modules.items()
         if isinstance(module_name, str) and isinstance(module_config, dict)
     }
+    if config_diff is None:
+        added_modules = current_modules - previous_state.module_names
+        removed_modules = previous_state.module_names - set(modules)
+    else:
+        added_modules = config_diff.added_modules & current_modules
+        removed_modules = config_diff.removed_modules & previous_state.module_names
 
-    if current_modules != previous_state.module_names:
-        return {name: set() for name in current_modules}, {}, removed_modules
-
-    for module_name in current_modules:
-        source = (dotfiles / module_name).resolve()
-        old_templates = _module_templates(previous_state.templates, module_name)
-        changed_names = {
-            path.relative_to(source).as_posix()
-            for path in changed_paths
-            if path.is_relative_to(source) and not path.is_dir()
-        }
-        target_changed = (
-            module_target(module_name, modules[module_name])
-            != previous_state.module_targets[module_name]
+    changed_names_by_source = _changed_names_by_source(
+        changed_paths, previous_state.source_index
+    )
+    changed_prefixes = {
+        prefix for path in changed_variables for prefix in _variable_path_prefixes(path)
+    }
+    library_templates, changed_library_names, library_dependents = _library_changes(
+        previous_state,
+        changed_names_by_source,
+        changed_variables,
+        changed_prefixes,
+        metadata_cache,
+        ignore,
+    )
+    for module_name in added_modules:
+        metadata_by_name = _load_module_templates(
+            (dotfiles / module_name).resolve(), metadata_cache, ignore
+        )
+        new_metadata[module_name] = metadata_by_name
+        affected_names[module_name] = set(metadata_by_name)
+    for module_name in current_modules & previous_state.module_names:
+        module = previous_state.modules[module_name]
+        source = module.source_path
+        old_templates = module.templates
+        changed_names = changed_names_by_source.get(source, set())
+        if config_diff is None:
+            target_changed = (
+                module_target(module_name, modules[module_name])
+                != previous_state.module_targets[module_name]
+            )
+        else:
+            target_changed = module_name in config_diff.retargeted_modules
+        variable_names = _variable_template_names(
+            module, changed_variables, changed_prefixes
+        )
+        library_names = (
+            changed_library_names - set(old_templates)
+            if module_name in library_dependents
+            else set()
         )
         if changed_names or target_changed:
-            metadata_by_name = _load_module_templates(source)
+            metadata_by_name = _load_module_templates(source, metadata_cache, ignore)
             new_metadata[module_name] = metadata_by_name
+        elif variable_names or library_names:
+            metadata_by_name = _module_metadata(module)
         else:
-            metadata_by_name = {
-                name: TemplateMetadata(
-                    template_name=template.template_name,
-                    relative_path=template.relative_path,
-                    variable_names=template.variable_names,
-                    dependency_names=template.dependency_names,
-                    has_dynamic_dependencies=template.has_dynamic_dependencies,
-                )
-                for name, template in old_templates.items()
-            }
+            continue
         relevant_names = set(old_templates) | set(metadata_by_name)
         names = _affected_template_names(
             old_templates,
             metadata_by_name,
             (changed_names & relevant_names)
-            | (set(old_templates) - set(metadata_by_name)),
-            changed_variables,
+            | (set(old_templates) - set(metadata_by_name))
+            | variable_names,
             target_changed,
+            library_names - set(metadata_by_name),
         )
         if names:
             affected_names[module_name] = names
-        if module_name in new_metadata:
-            continue
-        if changed_variables:
-            new_metadata[module_name] = metadata_by_name
+            new_metadata.setdefault(module_name, metadata_by_name)
+
+    return affected_names, new_metadata, removed_modules, library_templates
+
 
-    return affected_names, new_metadata, removed_modules
+def _record_live_size(stats: StatsRecorder, manifest: LiveManifest) -> None:
+    for module_name, (files, size) in manifest.totals().items():
+        stats.set_gauge("live_files", module_name, files)
+        stats.set_gauge("live_size_bytes", module_name, size)
+
+
+def record_live_size(
+    stats: StatsRecorder,
+    live_root: Path,
+    module_names: Iterable[str],
+) -> None:
+    manifest = LiveManifest(live_root)
+    for module_name in module_names:
+        manifest.entries(module_name)
+    _record_live_size(stats, manifest)
 
 
 def render_live(
@@ -319,77 +944,198 @@ def render_live(
     theme_name: str | None = None,
     changed_paths: set[Path] | None = None,
     changed_variables: set[str] | None = None,
+    jobs: int = 1,
+    metadata_cache: TemplateMetadataCache | None = None,
+    bytecode_cache: TemplateBytecodeCache | None = None,
+    generations: bool = False,
+    stats: StatsRecorder | None = None,
+    ignore: IgnoreMatcher | None = None,
+    config_diff: ConfigDiff | None = None,
+    cancel: CancelToken | None = None,
+    variables: dict[str, Any] | None = None,
 ) -> LiveState:
     modules = config.get("dotfiles")
     if not isinstance(modules, dict):
         raise DaemonError("Config must contain a 'dotfiles' mapping")
+    if config_diff is not None and changed_variables is None:
+        changed_variables = set(config_diff.variables)
 
     try:
-        variables = template_variables(config, dotfiles, theme_name)
+        if variables is None:
+            variables = template_variables(config, dotfiles, theme_name)
+        library = library_root(config, dotfiles)
     except ValueError as exc:
         raise DaemonError(str(exc)) from exc
+    if library is not None:
+        for module_name in modules:
+            source = (dotfiles / str(module_name)).resolve()
+            if library.is_relative_to(source) or source.is_relative_to(library):
+                raise DaemonError(
+                    f"Config 'library_dir' overlaps dotfile module: {module_name}"
+                )
 
     live_root.mkdir(parents=True, exist_ok=True)
+    render = _LiveRender(
+        dotfiles=dotfiles,
+        live_root=live_root,
+        variables=variables,
+        manifest=LiveManifest(live_root),
+        bytecode_cache=bytecode_cache
+        or TemplateBytecodeCache(live_root / BYTECODE_CACHE_DIRECTORY),
+        metadata_cache=metadata_cache or TemplateMetadataCache(),
+        jobs=jobs,
+        library=library,
+        generation=LiveGeneration(live_root) if generations else None,
+        stats=stats or StatsRecorder(),
+        ignore=ignore or load_ignore(dotfiles),
+        cancel=cancel,
+    )
+    render.stats.increment("renders")
+    started = time.perf_counter()
+    try:
+        with render.stats.phase("render_live"):
+            state = _render_live(
+                modules,
+                render,
+                previous_state,
+                changed_paths,
+                changed_variables,
+                config_diff,
+            )
+    except BaseException as exc:
+        render.stats.increment(
+            "render_cancellations"
+            if isinstance(exc, RenderCancelledError)
+            else "render_failures"
+        )
+        if render.generation is not None:
+            render.generation.discard()
+        raise
+    finally:
+        render.manifest.save()
+        _record_live_size(render.stats, render.manifest)
+    if render.generation is not None:
+        render.generation.commit(state.module_names)
+    render.stats.observe_latency("render", time.perf_counter() - started)
+    return state
+
+
+def _render_full(
+    modules: dict[str, dict[str, Any]],
+    render: _LiveRender,
+    previous_state: LiveState,
+) -> LiveState:
+    render.stats.increment("full_renders")
+    next_state = _state_from_modules(modules, render)
+    _remove_stale_outputs(previous_state, next_state, render)
+    return next_state
+
+
+def _render_live(
+    modules: dict[str, dict[str, Any]],
+    render: _LiveRender,
+    previous_state: LiveState | None,
+    changed_paths: set[Path] | None,
+    changed_variables: set[str] | None,
+    config_diff: ConfigDiff | None = None,
+) -> LiveState:
     if previous_state is None:
-        return _state_from_modules(modules, dotfiles, live_root, variables)
+        render.stats.increment("full_renders")
+        return _state_from_modules(modules, render)
 
     if changed_paths is None and changed_variables is None:
-        for template in previous_state.templates.values():
-            _remove_live_link(template.link_path, live_root)
-        for module_name in previous_state.module_names:
-            stale_path = live_root / module_name
-            if stale_path.exists():
-                shutil.rmtree(stale_path)
-        return _state_from_modules(modules, dotfiles, live_root, variables)
+        return _render_full(modules, render, previous_state)
+    if (
+        previous_state.library_path != render.library
+        if config_diff is None
+        else config_diff.library_changed
+    ):
+        return _render_full(modules, render, previous_state)
+    if not all(
+        isinstance(module_name, str) and isinstance(module_config, dict)
+        for module_name, module_config in modules.items()
+    ):
+        return _render_full(modules, render, previous_state)
 
     if changed_paths is None:
         changed_paths = set()
     if changed_variables is None:
         changed_variables = set()
+    if (
+        config_diff is not None
+        and config_diff.is_empty
+        and not changed_paths
+        and not changed_variables
+    ):
+        render.stats.increment("incremental_renders")
+        return previous_state
 
-    affected_names, new_metadata, removed_modules = _module_changes(
-        previous_state,
-        modules,
-        dotfiles,
-        changed_paths,
-        changed_variables,
-    )
-    if set(modules) != previous_state.module_names:
-        for template in previous_state.templates.values():
-            _remove_live_link(template.link_path, live_root)
-        for module_name in previous_state.module_names:
-            stale_path = live_root / module_name
-            if stale_path.exists():
-                shutil.rmtree(stale_path)
-        return _state_from_modules(modules, dotfiles, live_root, variables)
-    if not affected_names and not removed_modules:
+    dotfiles = render.dotfiles
+    live_root = render.live_root
+    with render.stats.phase(
+        "metadata_scan",
+        changed_paths=sorted(path.as_posix() for path in changed_paths),
+        changed_variables=sorted(changed_variables),
+    ):
+        (
+            affected_names,
+            new_metadata,
+            removed_modules,
+            library_templates,
+        ) = _module_changes(
+            previous_state,
+            modules,
+            dotfiles,
+            changed_paths,
+            changed_variables,
+            render.metadata_cache,
+            render.ignore,
+            config_diff,
+        )
+    render.stats.increment("incremental_renders")
+    if (
+        not affected_names
+        and not removed_modules
+        and library_templates is previous_state.library_templates
+    ):
         return previous_state
 
     rendered_by_module: dict[str, list[RenderedTemplate]] = {}
     for module_name, names in affected_names.items():
+        render.check_cancelled()
         source = (dotfiles / module_name).resolve()
         current_names = names & set(new_metadata[module_name])
         if current_names:
-            rendered_by_module[module_name] = _render_module_templates(
-                source,
-                variables,
-                current_names,
-            )
+            with render.stats.phase(
+                "render", module=module_name, templates=sorted(current_names)
+            ):
+                rendered_by_module[module_name] = _render_module_templates(
+                    source,
+                    render.variables,
+                    current_names,
+                    render.bytecode_cache,
+                    new_metadata[module_name],
+                    render.library,
+                )
 
-    next_state = _rebuild_state(previous_state, modules, dotfiles, new_metadata)
+    next_state = _rebuild_state(
+        previous_state,
+        modules,
+        dotfiles,
+        new_metadata,
+        rendered_by_module,
+        library_templates,
+    )
 
     for module_name in removed_modules:
-        for template in _module_templates(
-            previous_state.templates, module_name
-        ).values():
+        for template in previous_state.modules[module_name].templates.values():
             _remove_live_link(template.link_path, live_root)
-        stale_path = live_root / module_name
-        if stale_path.exists():
-            shutil.rmtree(stale_path)
+        _remove_live_module(render, module_name)
 
     for module_name, names in affected_names.items():
-        old_templates = _module_templates(previous_state.templates, module_name)
-        new_templates = _module_templates(next_state.templates, module_name)
+        previous_module = previous_state.modules.get(module_name)
+        old_templates = {} if previous_module is None else previous_module.templates
+        new_templates = next_state.modules[module_name].templates
         rendered = {
             template.metadata.template_name: template
             for template in rendered_by_module.get(module_name, [])
@@ -398,10 +1144,7 @@ def render_live(
         for name in names - set(new_templates):
             old_template = old_templates[name]
             _remove_live_link(old_template.link_path, live_root)
-            live_path = live_root / module_name / old_template.relative_path
-            if live_path.exists():
-                live_path.unlink()
-                _remove_empty_directories(live_path.parent, live_root / module_name)
+            _remove_live_output(render, module_name, old_template.relative_path)
 
         for name, template in new_templates.items():
             old_template = old_templates.get(name)
@@ -411,8 +1154,22 @@ def render_live(
                 _remove_live_link(old_template.link_path, live_root)
 
         for name, template in rendered.items():
-            live_path = live_root / module_name / template.metadata.relative_path
-            _write_live_file(live_path, template.content)
-            atomic_symlink(new_templates[name].link_path, live_path)
+            _deploy_output(
+                render,
+                module_name,
+                template.metadata.relative_path,
+                new_templates[name].link_path,
+                template.content,
+            )
+        for name in names & set(new_templates):
+            template = new_templates[name]
+            if template.is_binary:
+                _deploy_file(
+                    render,
+                    module_name,
+                    template.source_path / name,
+                    template.relative_path,
+                    template.link_path,
+                )
 
     return next_state
@@ -12,6 +12,7 @@ from stash.daemon import DaemonError, run_daemon
 from stash.dbus_client import DBusClientError, call_dbus_command, format_dbus_result
 from stash.dbus_service import DBusCommand, get_dbus_commands
 from stash.systemd import SystemdInstallError, install_user_service
+from stash.watcher import Debounce
 
 
 def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
@@ -37,6 +38,39 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         help="Watch templates and render live updates",
     )
     daemon_parser.set_defaults(func=daemon_command)
+    daemon_parser.add_argument(
+        "--jobs",
+        type=_positive_int,
+        default=1,
+        help="Number of worker processes used for full renders",
+    )
+    daemon_parser.add_argument(
+        "--generations",
+        action="store_true",
+        help="Switch complete live trees atomically instead of updating files",
+    )
+    daemon_parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        help="Write OpenMetrics text to this file for a textfile collector",
+    )
+    daemon_parser.add_argument(
+        "--trace",
+        type=Path,
+        help="Write Chrome trace events for each update to this file",
+    )
+    daemon_parser.add_argument(
+        "--debounce-quiet",
+        type=_positive_float,
+        default=Debounce.quiet,
+        help="Seconds without file events before an update is rendered",
+    )
+    daemon_parser.add_argument(
+        "--debounce-max",
+        type=_positive_float,
+        default=Debounce.max_latency,
+        help="Maximum seconds an update waits for file events to settle",
+    )
     systemd_install_parser = subparsers.add_parser(
         "systemd-install",
         help="Install and start the stash systemd user service",
@@ -67,6 +101,26 @@ def _parse_bool(value: str) -> bool:
     raise argparse.ArgumentTypeError(f"Expected a boolean value, got: {value}")
 
 
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Expected an integer, got: {value}") from exc
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Expected a positive integer, got: {value}")
+    return number
+
+
+def _positive_float(value: str) -> float:
+    try:
+        number = float(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Expected a number, got: {value}") from exc
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"Expected a positive number, got: {value}")
+    return number
+
+
 def _cli_argument_type(python_type: type[Any]):
     if python_type is bool:
         return _parse_bool
@@ -93,6 +147,11 @@ def daemon_command(args: argparse.Namespace) -> int:
                 config_path.resolve(),
                 args.dotfiles.resolve(),
                 Path.home() / ".local/share/stash/live",
+                args.jobs,
+                args.generations,
+                args.metrics_file,
+                args.trace,
+                Debounce(args.debounce_quiet, args.debounce_max),
             )
         )
     except DaemonError as exc:
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote
+
+
+MANIFEST_DIRECTORY = ".manifest"
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    digest: str
+    link_path: Path
+    inode: int
+    size: int
+    mtime_ns: int
+
+
+def content_digest(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    stat = path.stat()
+    return f"stat:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _entry_from_json(value: dict[str, Any]) -> ManifestEntry:
+    return ManifestEntry(
+        digest=value["digest"],
+        link_path=Path(value["link_path"]),
+        inode=value["inode"],
+        size=value["size"],
+        mtime_ns=value["mtime_ns"],
+    )
+
+
+def _entry_to_json(entry: ManifestEntry) -> dict[str, Any]:
+    return {
+        "digest": entry.digest,
+        "link_path": entry.link_path.as_posix(),
+        "inode": entry.inode,
+        "size": entry.size,
+        "mtime_ns": entry.mtime_ns,
+    }
+
+
+class LiveManifest:
+    def __init__(self, live_root: Path) -> None:
+        self._root = live_root / MANIFEST_DIRECTORY
+        self._modules: dict[str, dict[Path, ManifestEntry]] = {}
+        self._dirty: set[str] = set()
+
+    def _path(self, module_name: str) -> Path:
+        return self._root / f"{quote(module_name, safe='')}.json"
+
+    def entries(self, module_name: str) -> dict[Path, ManifestEntry]:
+        entries = self._modules.get(module_name)
+        if entries is not None:
+            return entries
+        entries = {}
+        try:
+            data = json.loads(self._path(module_name).read_text())
+            entries = {
+                Path(relative_path): _entry_from_json(value)
+                for relative_path, value in data.items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            entries = {}
+        self._modules[module_name] = entries
+        return entries
+
+    def get(self, module_name: str, relative_path: Path) -> ManifestEntry | None:
+        return self.entries(module_name).get(relative_path)
+
+    def is_current(
+        self,
+        module_name: str,
+        relative_path: Path,
+        live_path: Path,
+        digest: str,
+    ) -> bool:
+        entry = self.get(module_name, relative_path)
+        if entry is None or entry.digest != digest:
+            return False
+        try:
+            stat = live_path.lstat()
+        except OSError:
+            return False
+        return (
+            stat.st_ino == entry.inode
+            and stat.st_size == entry.size
+            and stat.st_mtime_ns == entry.mtime_ns
+        )
+
+    def is_linked(
+        self,
+        module_name: str,
+        relative_path: Path,
+        link_path: Path,
+        live_path: Path,
+    ) -> bool:
+        entry = self.get(module_name, relative_path)
+        if entry is None or entry.link_path != link_path:
+            return False
+        try:
+            return os.readlink(link_path) == str(live_path)
+        except OSError:
+            return False
+
+    def record(
+        self,
+        module_name: str,
+        relative_path: Path,
+        live_path: Path,
+        link_path: Path,
+        digest: str,
+    ) -> None:
+        stat = live_path.lstat()
+        self.entries(module_name)[relative_path] = ManifestEntry(
+            digest=digest,
+            link_path=link_path,
+            inode=stat.st_ino,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+        self._dirty.add(module_name)
+
+    def discard(self, module_name: str, relative_path: Path) -> None:
+        if self.entries(module_name).pop(relative_path, None) is not None:
+            self._dirty.add(module_name)
+
+    def remove_module(self, module_name: str) -> None:
+        self._modules[module_name] = {}
+        self._dirty.add(module_name)
+
+    def totals(self) -> dict[str, tuple[int, int]]:
+        return {
+            module_name: (
+                len(entries),
+                sum(entry.size for entry in entries.values()),
+            )
+            for module_name, entries in self._modules.items()
+        }
+
+    def save(self) -> None:
+        for module_name in sorted(self._dirty):
+            path = self._path(module_name)
+            entries = self._modules.get(module_name, {})
+            if not entries:
+                path.unlink(missing_ok=True)
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary_path = path.with_name(f".{path.name}.tmp")
+            temporary_path.write_text(
+                json.dumps(
+                    {
+                        relative_path.as_posix(): _entry_to_json(entry)
+                        for relative_path, entry in sorted(entries.items())
+                    },
+                    sort_keys=True,
+                )
+            )
+            temporary_path.replace(path)
+        self._dirty.clear()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from stash.stats import Histogram, StatsRecorder
+
+
+METRIC_PREFIX = "stash"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _histogram_lines(
+    name: str,
+    label: str,
+    help_text: str,
+    histograms: dict[str, Histogram],
+) -> list[str]:
+    if not histograms:
+        return []
+    metric = f"{METRIC_PREFIX}_{name}_seconds"
+    lines = [
+        f"# HELP {metric} {help_text}",
+        f"# TYPE {metric} histogram",
+    ]
+    for value, histogram in sorted(histograms.items()):
+        labels = f'{label}="{value}"'
+        for bound, count in histogram.cumulative_counts():
+            lines.append(
+                f'{metric}_bucket{{{labels},le="{_format_bound(bound)}"}} {count}'
+            )
+        lines.append(f"{metric}_sum{{{labels}}} {histogram.total!r}")
+        lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def format_metrics(stats: StatsRecorder) -> str:
+    counters = stats.counters()
+    gauges = stats.gauges()
+    lines = [
+        *_histogram_lines(
+            "latency",
+            "operation",
+            "Wall-clock duration of complete renders and updates.",
+            stats.latencies(),
+        ),
+        *_histogram_lines(
+            "phase_duration",
+            "phase",
+            "Time spent in each phase, excluding nested phases.",
+            stats.histograms(),
+        ),
+    ]
+    for name, value in sorted(counters.items()):
+        metric = f"{METRIC_PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+
+    full_renders = counters.get("full_renders", 0)
+    incremental_renders = counters.get("incremental_renders", 0)
+    if full_renders or incremental_renders:
+        lines.append(f"# TYPE {METRIC_PREFIX}_incremental_render_ratio gauge")
+        lines.append(
+            f"{METRIC_PREFIX}_incremental_render_ratio "
+            f"{incremental_renders / (full_renders + incremental_renders)!r}"
+        )
+
+    for name in ("live_files", "live_size_bytes"):
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {sum(gauges.get(name, {}).values())}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: Path, stats: StatsRecorder) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f".{path.name}.tmp")
+    temporary_path.write_text(format_metrics(stats))
+    temporary_path.replace(path)
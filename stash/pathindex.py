@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from pathlib import Path
+
+
+class _Node:
+    __slots__ = ("children", "root")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.root: Path | None = None
+
+
+class PathIndex:
+    def __init__(self, roots: Iterable[Path] = ()) -> None:
+        self._root = _Node()
+        self.roots: frozenset[Path] = frozenset(roots)
+        for root in self.roots:
+            node = self._root
+            for part in root.parts:
+                node = node.children.setdefault(part, _Node())
+            node.root = root
+
+    def match(self, path: Path) -> tuple[Path, str] | None:
+        node = self._root
+        match: tuple[Path, int] | None = None
+        parts = path.parts
+        for depth, part in enumerate(parts):
+            child = node.children.get(part)
+            if child is None:
+                break
+            node = child
+            if node.root is not None:
+                match = node.root, depth + 1
+        if match is None:
+            return None
+        root, depth = match
+        return root, "/".join(parts[depth:])
+
+    def group(self, paths: Iterable[Path]) -> dict[Path, set[str]]:
+        grouped: dict[Path, set[str]] = {}
+        for path in paths:
+            match = self.match(path)
+            if match is not None:
+                root, name = match
+                grouped.setdefault(root, set()).add(name)
+        return grouped
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import shutil
+
+from stash.deployment import atomic_symlink
+from stash.live import LiveState
+from stash.manifest import LiveManifest
+
+
+@dataclass(frozen=True)
+class ReconcilePlan:
+    create_links: tuple[tuple[Path, Path], ...] = ()
+    replace_links: tuple[tuple[Path, Path], ...] = ()
+    remove_links: tuple[Path, ...] = ()
+    remove_files: tuple[Path, ...] = ()
+    outdated_templates: tuple[Path, ...] = ()
+
+    @property
+    def is_empty(self) -> bool:
+        return not (
+            self.create_links
+            or self.replace_links
+            or self.remove_links
+            or self.remove_files
+            or self.outdated_templates
+        )
+
+    def describe(self) -> list[str]:
+        return [
+            *(f"create {link_path}" for link_path, _ in self.create_links),
+            *(f"replace {link_path}" for link_path, _ in self.replace_links),
+            *(f"remove {path}" for path in self.remove_links),
+            *(f"remove {path}" for path in self.remove_files),
+            *(f"render {path}" for path in self.outdated_templates),
+        ]
+
+
+def _scan_directory(path: Path) -> dict[str, os.DirEntry[str]]:
+    try:
+        with os.scandir(path) as entries:
+            return {entry.name: entry for entry in entries}
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+
+
+def _points_into(target: str, roots: tuple[Path, ...]) -> bool:
+    return any(Path(target).is_relative_to(root) for root in roots)
+
+
+def _scan_links(
+    state: LiveState,
+    live_root: Path,
+) -> tuple[
+    list[tuple[Path, Path]],
+    list[tuple[Path, Path]],
+    list[Path],
+]:
+    desired_by_directory: dict[Path, dict[str, Path]] = {}
+    for template in state.templates.values():
+        link_path = template.link_path
+        desired_by_directory.setdefault(link_path.parent, {})[link_path.name] = (
+            live_root / template.module_name / template.relative_path
+        )
+
+    roots = (live_root, live_root.resolve())
+    create_links: list[tuple[Path, Path]] = []
+    replace_links: list[tuple[Path, Path]] = []
+    remove_links: list[Path] = []
+    for directory, desired in sorted(desired_by_directory.items()):
+        entries = _scan_directory(directory)
+        for name, live_path in sorted(desired.items()):
+            entry = entries.get(name)
+            link_path = directory / name
+            if entry is None:
+                create_links.append((link_path, live_path))
+            elif entry.is_symlink():
+                if os.readlink(entry.path) != str(live_path):
+                    replace_links.append((link_path, live_path))
+            elif not entry.is_dir(follow_symlinks=False):
+                replace_links.append((link_path, live_path))
+        for name, entry in sorted(entries.items()):
+            if (
+                name not in desired
+                and entry.is_symlink()
+                and _points_into(os.readlink(entry.path), roots)
+            ):
+                remove_links.append(directory / name)
+    return create_links, replace_links, remove_links
+
+
+def _scan_outputs(
+    directory: Path,
+    relative_directory: Path,
+    files: dict[Path, os.DirEntry[str]],
+) -> None:
+    for entry in _scan_directory(directory).values():
+        relative_path = relative_directory / entry.name
+        if entry.is_dir(follow_symlinks=False):
+            _scan_outputs(Path(entry.path), relative_path, files)
+        else:
+            files[relative_path] = entry
+
+
+def _is_recorded(
+    manifest: LiveManifest,
+    module_name: str,
+    relative_path: Path,
+    entry: os.DirEntry[str],
+) -> bool:
+    recorded = manifest.get(module_name, relative_path)
+    if recorded is None:
+        return False
+    try:
+        stat = entry.stat(follow_symlinks=False)
+    except OSError:
+        return False
+    return (
+        stat.st_ino == recorded.inode
+        and stat.st_size == recorded.size
+        and stat.st_mtime_ns == recorded.mtime_ns
+    )
+
+
+def _scan_live_files(
+    state: LiveState,
+    live_root: Path,
+    manifest: LiveManifest,
+) -> tuple[list[Path], list[Path]]:
+    remove_files: list[Path] = []
+    outdated_templates: list[Path] = []
+    for name, entry in sorted(_scan_directory(live_root).items()):
+        if name.startswith(".") or name in state.module_names:
+            continue
+        remove_files.append(Path(entry.path))
+
+    for module_name, module in sorted(state.modules.items()):
+        module_root = live_root / module_name
+        files: dict[Path, os.DirEntry[str]] = {}
+        _scan_outputs(module_root, Path(), files)
+        desired = {
+            template.relative_path: template for template in module.templates.values()
+        }
+        for relative_path, template in sorted(desired.items()):
+            entry = files.get(relative_path)
+            if entry is None or not _is_recorded(
+                manifest, module_name, relative_path, entry
+            ):
+                outdated_templates.append(template.source_path / template.template_name)
+        remove_files.extend(
+            module_root / relative_path
+            for relative_path in sorted(files.keys() - desired.keys())
+        )
+    return remove_files, outdated_templates
+
+
+def plan_reconcile(
+    state: LiveState,
+    live_root: Path,
+    manifest: LiveManifest | None = None,
+) -> ReconcilePlan:
+    create_links, replace_links, remove_links = _scan_links(state, live_root)
+    remove_files, outdated_templates = _scan_live_files(
+        state,
+        live_root,
+        manifest or LiveManifest(live_root),
+    )
+    return ReconcilePlan(
+        create_links=tuple(create_links),
+        replace_links=tuple(replace_links),
+        remove_links=tuple(remove_links),
+        remove_files=tuple(remove_files),
+        outdated_templates=tuple(outdated_templates),
+    )
+
+
+def _remove_empty_parents(path: Path, live_root: Path) -> None:
+    current = path.parent
+    while current != live_root and current.is_relative_to(live_root):
+        try:
+            current.rmdir()
+        except OSError:
+            break
+        current = current.parent
+
+
+def apply_reconcile(plan: ReconcilePlan, live_root: Path) -> None:
+    for link_path, live_path in (*plan.create_links, *plan.replace_links):
+        atomic_symlink(link_path, live_path)
+    for path in plan.remove_links:
+        path.unlink(missing_ok=True)
+    for path in plan.remove_files:
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path)
+        else:
+            path.unlink(missing_ok=True)
+            _remove_empty_parents(path, live_root)
+
+
+def reconcile_live(state: LiveState, live_root: Path) -> ReconcilePlan:
+    plan = plan_reconcile(state, live_root)
+    apply_reconcile(plan, live_root)
+    return plan
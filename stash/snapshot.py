@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+import hashlib
+import json
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote
+
+from stash.config import template_variables
+from stash.ignore import IgnoreMatcher
+from stash.live import (
+    DaemonError,
+    LiveModule,
+    LiveState,
+    LiveTemplate,
+    live_module,
+    record_live_size,
+    render_live,
+)
+from stash.stats import StatsRecorder
+from stash.templates import (
+    TemplateBytecodeCache,
+    TemplateMetadata,
+    TemplateMetadataCache,
+)
+
+
+SNAPSHOT_DIRECTORY = ".state"
+SNAPSHOT_VERSION = 5
+
+FileStat = tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class LiveSnapshot:
+    state: LiveState
+    theme_name: str | None
+    variable_fingerprints: dict[str, str]
+    file_stats: dict[str, dict[str, FileStat]]
+    library_file_stats: dict[str, FileStat]
+
+
+def variable_fingerprints(variables: dict[str, Any]) -> dict[str, str]:
+    return {
+        name: hashlib.sha256(
+            json.dumps(value, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        for name, value in variables.items()
+    }
+
+
+def _module_file_stats(source: Path) -> dict[str, FileStat]:
+    stats: dict[str, FileStat] = {}
+    if not source.is_dir():
+        return stats
+    for path in source.rglob("*"):
+        try:
+            stat = path.lstat()
+        except OSError:
+            continue
+        if path.is_file():
+            stats[path.relative_to(source).as_posix()] = (
+                stat.st_ino,
+                stat.st_size,
+                stat.st_mtime_ns,
+            )
+    return stats
+
+
+def _module_path(root: Path, module_name: str) -> Path:
+    return root / "modules" / f"{quote(module_name, safe='')}.json"
+
+
+def _template_to_json(template: LiveTemplate) -> dict[str, Any]:
+    return {
+        "template_name": template.template_name,
+        "relative_path": template.relative_path.as_posix(),
+        "link_path": template.link_path.as_posix(),
+        "variable_names": sorted(template.variable_names),
+        "variable_paths": sorted(template.variable_paths),
+        "traced_dependency_names": (
+            None
+            if template.traced_dependency_names is None
+            else sorted(template.traced_dependency_names)
+        ),
+        "dependency_names": sorted(template.dependency_names),
+        "has_dynamic_dependencies": template.has_dynamic_dependencies,
+        "is_binary": template.is_binary,
+    }
+
+
+def _template_from_json(
+    module_name: str,
+    source: Path,
+    value: dict[str, Any],
+) -> LiveTemplate:
+    return LiveTemplate(
+        module_name=module_name,
+        source_path=source,
+        template_name=value["template_name"],
+        relative_path=Path(value["relative_path"]),
+        link_path=Path(value["link_path"]),
+        variable_names=frozenset(value["variable_names"]),
+        dependency_names=frozenset(value["dependency_names"]),
+        has_dynamic_dependencies=value["has_dynamic_dependencies"],
+        variable_paths=frozenset(value["variable_paths"]),
+        traced_dependency_names=(
+            None
+            if value["traced_dependency_names"] is None
+            else frozenset(value["traced_dependency_names"])
+        ),
+        is_binary=value["is_binary"],
+    )
+
+
+def _metadata_to_json(metadata: TemplateMetadata) -> dict[str, Any]:
+    return {
+        "template_name": metadata.template_name,
+        "relative_path": metadata.relative_path.as_posix(),
+        "variable_names": sorted(metadata.variable_names),
+        "variable_paths": sorted(metadata.variable_paths),
+        "dependency_names": sorted(metadata.dependency_names),
+        "has_dynamic_dependencies": metadata.has_dynamic_dependencies,
+        "is_binary": metadata.is_binary,
+    }
+
+
+def _metadata_from_json(value: dict[str, Any]) -> TemplateMetadata:
+    return TemplateMetadata(
+        template_name=value["template_name"],
+        relative_path=Path(value["relative_path"]),
+        variable_names=frozenset(value["variable_names"]),
+        dependency_names=frozenset(value["dependency_names"]),
+        has_dynamic_dependencies=value["has_dynamic_dependencies"],
+        variable_paths=frozenset(value["variable_paths"]),
+        is_binary=value["is_binary"],
+    )
+
+
+def _write_json(path: Path, value: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f".{path.name}.tmp")
+    temporary_path.write_text(json.dumps(value, sort_keys=True))
+    temporary_path.replace(path)
+
+
+def _changed_sources(
+    state: LiveState,
+    changed_paths: Iterable[Path] | None,
+) -> set[Path] | None:
+    if changed_paths is None:
+        return None
+    return set(state.source_index.group(changed_paths))
+
+
+def _changed_modules(
+    previous_state: LiveState | None,
+    state: LiveState,
+    changed_sources: set[Path] | None,
+) -> set[str]:
+    if previous_state is None or changed_sources is None:
+        return set(state.module_names)
+    return {
+        module_name
+        for module_name, module in state.modules.items()
+        if previous_state.modules.get(module_name) is not module
+        or module.source_path in changed_sources
+    }
+
+
+def _library_changed(
+    previous_state: LiveState | None,
+    state: LiveState,
+    changed_sources: set[Path] | None,
+) -> bool:
+    if previous_state is None or changed_sources is None:
+        return True
+    if previous_state.library_path != state.library_path:
+        return True
+    return state.library_path in changed_sources
+
+
+def save_snapshot(
+    live_root: Path,
+    dotfiles: Path,
+    state: LiveState,
+    theme_name: str | None,
+    variables: dict[str, Any],
+    previous_state: LiveState | None = None,
+    changed_paths: Iterable[Path] | None = None,
+) -> None:
+    root = live_root / SNAPSHOT_DIRECTORY
+    changed_sources = _changed_sources(state, changed_paths)
+    for module_name in _changed_modules(previous_state, state, changed_sources):
+        source = (dotfiles / module_name).resolve()
+        _write_json(
+            _module_path(root, module_name),
+            {
+                "templates": [
+                    _template_to_json(template)
+                    for _, template in sorted(
+                        state.modules[module_name].templates.items()
+                    )
+                ],
+                "files": _module_file_stats(source),
+            },
+        )
+    if previous_state is not None:
+        for module_name in previous_state.module_names - state.module_names:
+            _module_path(root, module_name).unlink(missing_ok=True)
+    if _library_changed(previous_state, state, changed_sources):
+        _write_json(
+            root / "library.json",
+            {
+                "templates": [
+                    _metadata_to_json(metadata)
+                    for _, metadata in sorted(state.library_templates.items())
+                ],
+                "files": (
+                    {}
+                    if state.library_path is None
+                    else _module_file_stats(state.library_path)
+                ),
+            },
+        )
+
+    _write_json(
+        root / "index.json",
+        {
+            "version": SNAPSHOT_VERSION,
+            "dotfiles": dotfiles.resolve().as_posix(),
+            "theme": theme_name,
+            "variables": variable_fingerprints(variables),
+            "library": (
+                None if state.library_path is None else state.library_path.as_posix()
+            ),
+            "module_targets": {
+                module_name: target.as_posix()
+                for module_name, target in state.module_targets.items()
+            },
+        },
+    )
+
+
+def load_snapshot(live_root: Path, dotfiles: Path) -> LiveSnapshot | None:
+    root = live_root / SNAPSHOT_DIRECTORY
+    try:
+        index = json.loads((root / "index.json").read_text())
+        if (
+            index["version"] != SNAPSHOT_VERSION
+            or index["dotfiles"] != dotfiles.resolve().as_posix()
+        ):
+            return None
+        module_targets = {
+            module_name: Path(target)
+            for module_name, target in index["module_targets"].items()
+        }
+        modules: dict[str, LiveModule] = {}
+        file_stats: dict[str, dict[str, FileStat]] = {}
+        for module_name in module_targets:
+            source = (dotfiles / module_name).resolve()
+            module = json.loads(_module_path(root, module_name).read_text())
+            templates: dict[str, LiveTemplate] = {}
+            for value in module["templates"]:
+                template = _template_from_json(module_name, source, value)
+                templates[template.template_name] = template
+            modules[module_name] = live_module(source, templates)
+            file_stats[module_name] = {
+                name: (stat[0], stat[1], stat[2])
+                for name, stat in module["files"].items()
+            }
+        library_path = None if index["library"] is None else Path(index["library"])
+        library = json.loads((root / "library.json").read_text())
+        library_templates = {
+            metadata.template_name: metadata
+            for metadata in map(_metadata_from_json, library["templates"])
+        }
+        library_file_stats = {
+            name: (stat[0], stat[1], stat[2]) for name, stat in library["files"].items()
+        }
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return None
+
+    return LiveSnapshot(
+        state=LiveState(
+            module_names=frozenset(module_targets),
+            source_paths=frozenset(
+                (dotfiles / name).resolve() for name in module_targets
+            )
+            | ({library_path} if library_path is not None else set()),
+            module_targets=module_targets,
+            modules=modules,
+            library_path=library_path,
+            library_templates=library_templates,
+        ),
+        theme_name=index["theme"],
+        variable_fingerprints=dict(index["variables"]),
+        file_stats=file_stats,
+        library_file_stats=library_file_stats,
+    )
+
+
+def changed_source_paths(snapshot: LiveSnapshot, dotfiles: Path) -> set[Path]:
+    changed_paths: set[Path] = set()
+    for module_name, recorded in snapshot.file_stats.items():
+        source = (dotfiles / module_name).resolve()
+        current = _module_file_stats(source)
+        for name in set(recorded) | set(current):
+            if recorded.get(name) != current.get(name):
+                changed_paths.add(source / name)
+    library = snapshot.state.library_path
+    if library is not None:
+        current = _module_file_stats(library)
+        for name in set(snapshot.library_file_stats) | set(current):
+            if snapshot.library_file_stats.get(name) != current.get(name):
+                changed_paths.add(library / name)
+    return changed_paths
+
+
+def changed_variable_names(
+    snapshot: LiveSnapshot,
+    variables: dict[str, Any],
+) -> set[str]:
+    fingerprints = variable_fingerprints(variables)
+    return {
+        name
+        for name in set(fingerprints) | set(snapshot.variable_fingerprints)
+        if fingerprints.get(name) != snapshot.variable_fingerprints.get(name)
+    }
+
+
+def restore_live(
+    config: dict[str, Any],
+    dotfiles: Path,
+    live_root: Path,
+    theme_name: str | None = None,
+    jobs: int = 1,
+    metadata_cache: TemplateMetadataCache | None = None,
+    bytecode_cache: TemplateBytecodeCache | None = None,
+    generations: bool = False,
+    stats: StatsRecorder | None = None,
+    ignore: IgnoreMatcher | None = None,
+) -> LiveState:
+    try:
+        variables = template_variables(config, dotfiles, theme_name)
+    except ValueError as exc:
+        raise DaemonError(str(exc)) from exc
+
+    snapshot = load_snapshot(live_root, dotfiles)
+    if snapshot is None:
+        state = render_live(
+            config,
+            dotfiles,
+            live_root,
+            theme_name=theme_name,
+            jobs=jobs,
+            generations=generations,
+            metadata_cache=metadata_cache,
+            bytecode_cache=bytecode_cache,
+            stats=stats,
+            ignore=ignore,
+            variables=variables,
+        )
+        save_snapshot(live_root, dotfiles, state, theme_name, variables)
+        return state
+
+    changed_paths = changed_source_paths(snapshot, dotfiles)
+    changed_variables = changed_variable_names(snapshot, variables)
+    state = render_live(
+        config,
+        dotfiles,
+        live_root,
+        snapshot.state,
+        theme_name=theme_name,
+        changed_paths=changed_paths,
+        changed_variables=changed_variables,
+        jobs=jobs,
+        generations=generations,
+        metadata_cache=metadata_cache,
+        bytecode_cache=bytecode_cache,
+        stats=stats,
+        ignore=ignore,
+        variables=variables,
+    )
+    if (
+        changed_paths
+        or changed_variables
+        or state is not snapshot.state
+        or snapshot.theme_name != theme_name
+    ):
+        save_snapshot(
+            live_root,
+            dotfiles,
+            state,
+            theme_name,
+            variables,
+            snapshot.state,
+            changed_paths,
+        )
+    if stats is not None:
+        record_live_size(stats, live_root, state.module_names)
+    return state
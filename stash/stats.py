@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+import json
+import threading
+import time
+from typing import Any, TypeVar
+
+from stash.tracing import Tracer
+
+T = TypeVar("T")
+
+DURATION_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DURATION_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum: float | None = None
+        self.maximum: float | None = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def cumulative_counts(self) -> list[tuple[float, int]]:
+        cumulative: list[tuple[float, int]] = []
+        count = 0
+        for bound, bucket_count in zip((*self.buckets, float("inf")), self.counts):
+            count += bucket_count
+            cumulative.append((bound, count))
+        return cumulative
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.minimum,
+            "max": self.maximum,
+            "buckets": {
+                "+Inf" if bound == float("inf") else repr(bound): count
+                for bound, count in self.cumulative_counts()
+            },
+        }
+
+
+class StatsRecorder:
+    def __init__(self, tracer: Tracer | None = None) -> None:
+        self.tracer = tracer
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._histograms: dict[str, Histogram] = {}
+        self._latencies: dict[str, Histogram] = {}
+        self._counters: dict[str, int] = {}
+        self._gauges: dict[str, dict[str, float]] = {}
+        self.version = 0
+
+    def _observe(
+        self,
+        histograms: dict[str, Histogram],
+        name: str,
+        seconds: float,
+    ) -> None:
+        with self._lock:
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = Histogram()
+            histogram.observe(seconds)
+            self.version += 1
+
+    def observe(self, name: str, seconds: float) -> None:
+        self._observe(self._histograms, name, seconds)
+
+    def observe_latency(self, name: str, seconds: float) -> None:
+        self._observe(self._latencies, name, seconds)
+
+    def increment(self, name: str, count: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + count
+            self.version += 1
+
+    def set_gauge(self, name: str, label: str, value: float) -> None:
+        with self._lock:
+            values = self._gauges.setdefault(name, {})
+            if values.get(label) != value:
+                values[label] = value
+                self.version += 1
+
+    @contextmanager
+    def _phase(self, name: str, arguments: dict[str, Any] | None) -> Iterator[None]:
+        stack: list[float] = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            finished = time.perf_counter()
+            elapsed = finished - started
+            self.observe(name, elapsed - stack.pop())
+            if stack:
+                stack[-1] += elapsed
+            if self.tracer is not None and arguments is not None:
+                self.tracer.complete(name, started, finished, **arguments)
+
+    def phase(self, name: str, **arguments: Any) -> AbstractContextManager[None]:
+        return self._phase(name, arguments)
+
+    def span(
+        self,
+        name: str,
+        track: str | None = None,
+        **arguments: Any,
+    ) -> AbstractContextManager[None]:
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.span(name, track, **arguments)
+
+    def timed(self, name: str, values: Iterable[T]) -> Iterator[T]:
+        iterator = iter(values)
+        while True:
+            with self._phase(name, None):
+                try:
+                    value = next(iterator)
+                except StopIteration:
+                    return
+            yield value
+
+    def histograms(self) -> dict[str, Histogram]:
+        with self._lock:
+            return dict(self._histograms)
+
+    def latencies(self) -> dict[str, Histogram]:
+        with self._lock:
+            return dict(self._latencies)
+
+    def counters(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def gauges(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {name: dict(values) for name, values in self._gauges.items()}
+
+    def to_json(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "phases": {
+                    name: histogram.to_json()
+                    for name, histogram in sorted(self._histograms.items())
+                },
+                "latencies": {
+                    name: histogram.to_json()
+                    for name, histogram in sorted(self._latencies.items())
+                },
+                "counters": dict(sorted(self._counters.items())),
+                "gauges": {
+                    name: dict(sorted(values.items()))
+                    for name, values in sorted(self._gauges.items())
+                },
+            }
+
+    def dumps(self) -> str:
+        return json.dumps(self.to_json(), indent=2)
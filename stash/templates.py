@@ -1,17 +1,33 @@
 from __future__ import annotations
 
+import codecs
+from collections.abc import Iterable, Iterator, MutableMapping
 from dataclasses import dataclass
+import os
 from pathlib import Path
+import threading
 from typing import Any
 
 from jinja2 import (
+    BytecodeCache,
     Environment,
     FileSystemLoader,
     StrictUndefined,
+    Template,
     TemplateError,
+    Undefined,
     select_autoescape,
 )
-from jinja2 import meta
+from jinja2 import meta, nodes
+from jinja2.bccache import Bucket
+
+from stash.ignore import IgnoreMatcher
+
+
+DEFAULT_BYTECODE_CACHE_SIZE = 64 * 1024 * 1024
+BINARY_SNIFF_SIZE = 8192
+
+FileKey = tuple[int, int, int]
 
 
 class TemplateRenderError(RuntimeError):
@@ -25,23 +41,155 @@ class TemplateMetadata:
     variable_names: frozenset[str]
     dependency_names: frozenset[str]
     has_dynamic_dependencies: bool
+    variable_paths: frozenset[str] = frozenset()
+    is_binary: bool = False
 
 
 @dataclass(frozen=True)
 class RenderedTemplate:
     metadata: TemplateMetadata
     content: str
+    loaded_names: frozenset[str] = frozenset()
+
+
+class TemplateBytecodeCache(BytecodeCache):
+    def __init__(
+        self,
+        directory: Path,
+        max_size: int = DEFAULT_BYTECODE_CACHE_SIZE,
+    ) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self._size = 0
+        self._index: dict[Path, int] | None = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _path(self, bucket: Bucket) -> Path:
+        return self.directory / f"{bucket.key}-{bucket.checksum}.cache"
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        path = self._path(bucket)
+        try:
+            with path.open("rb") as handle:
+                bucket.load_bytecode(handle)
+            os.utime(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._index is not None and path in self._index:
+                self._index[path] = self._index.pop(path)
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        path = self._path(bucket)
+        temporary_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with temporary_path.open("wb") as handle:
+                bucket.write_bytecode(handle)
+                size = handle.tell()
+            temporary_path.replace(path)
+        except OSError:
+            temporary_path.unlink(missing_ok=True)
+            return
+        with self._lock:
+            index = self._index
+            if index is None:
+                index = self._index = self._scan()
+                self._size = sum(index.values())
+            else:
+                self._size += size - index.pop(path, 0)
+                index[path] = size
+            if self._size > self.max_size:
+                self._evict(index)
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._entries():
+                Path(entry.path).unlink(missing_ok=True)
+            self._index = {}
+            self._size = 0
+
+    def _entries(self) -> list[os.DirEntry[str]]:
+        try:
+            with os.scandir(self.directory) as entries:
+                return [entry for entry in entries if entry.name.endswith(".cache")]
+        except OSError:
+            return []
+
+    def _scan(self) -> dict[Path, int]:
+        entries: list[tuple[int, Path, int]] = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, Path(entry.path), stat.st_size))
+        return {path: size for _, path, size in sorted(entries)}
+
+    def _evict(self, index: dict[Path, int]) -> None:
+        while self._size > self.max_size and index:
+            path = next(iter(index))
+            self._size -= index.pop(path)
+            path.unlink(missing_ok=True)
+
+
+class TracingEnvironment(Environment):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.loaded_names: set[str] = set()
+
+    def _trace(self, name: Any, parent: str | None) -> None:
+        if isinstance(name, str):
+            self.loaded_names.add(
+                name if parent is None else self.join_path(name, parent)
+            )
+
+    def get_template(
+        self,
+        name: Any,
+        parent: str | None = None,
+        globals: MutableMapping[str, Any] | None = None,
+    ) -> Template:
+        self._trace(name, parent)
+        return super().get_template(name, parent, globals)
+
+    def select_template(
+        self,
+        names: Any,
+        parent: str | None = None,
+        globals: MutableMapping[str, Any] | None = None,
+    ) -> Template:
+        if not isinstance(names, Undefined):
+            names = list(names)
+            for name in names:
+                self._trace(name, parent)
+        return super().select_template(names, parent, globals)
 
 
 def hex_color(value: Any) -> str:
     return f"#{value}"
 
 
-def template_environment(root: Path) -> Environment:
-    environment = Environment(
-        loader=FileSystemLoader(root),
+def template_environment(
+    root: Path,
+    bytecode_cache: BytecodeCache | None = None,
+    library: Path | None = None,
+) -> TracingEnvironment:
+    search_path = [root] if library is None else [root, library]
+    environment = TracingEnvironment(
+        loader=FileSystemLoader(search_path),
         autoescape=select_autoescape(),
         undefined=StrictUndefined,
+        bytecode_cache=bytecode_cache,
     )
     environment.filters["hex_color"] = hex_color
     return environment
@@ -54,62 +202,224 @@ def template_output_path(template_name: str) -> Path:
     return relative_path
 
 
-def template_metadata(module: Path) -> dict[str, TemplateMetadata]:
+class TemplateMetadataCache:
+    def __init__(self) -> None:
+        self._entries: dict[Path, tuple[FileKey, TemplateMetadata]] = {}
+
+    def get(self, path: Path, key: FileKey) -> TemplateMetadata | None:
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != key:
+            return None
+        return entry[1]
+
+    def store(self, path: Path, key: FileKey, metadata: TemplateMetadata) -> None:
+        self._entries[path] = (key, metadata)
+
+    def invalidate(self, paths: Iterable[Path]) -> None:
+        for path in paths:
+            self._entries.pop(path, None)
+
+
+def _file_key(path: Path) -> FileKey:
+    stat = path.stat()
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _access_path(node: nodes.Node) -> list[str] | None:
+    if isinstance(node, nodes.Name):
+        return [node.name] if node.ctx == "load" else None
+    if isinstance(node, nodes.Getattr):
+        path = _access_path(node.node)
+        return None if path is None else [*path, node.attr]
+    if (
+        isinstance(node, nodes.Getitem)
+        and isinstance(node.arg, nodes.Const)
+        and isinstance(node.arg.value, (str, int))
+    ):
+        path = _access_path(node.node)
+        return None if path is None else [*path, str(node.arg.value)]
+    return None
+
+
+def _variable_paths(node: nodes.Node, variable_names: set[str]) -> set[str]:
+    if isinstance(node, nodes.Call) and isinstance(node.node, nodes.Getattr):
+        paths = _variable_paths(node.node.node, variable_names)
+        for child in node.iter_child_nodes():
+            if child is not node.node:
+                paths.update(_variable_paths(child, variable_names))
+        return paths
+    path = _access_path(node)
+    if path is not None and path[0] in variable_names:
+        return {".".join(path)}
+    paths: set[str] = set()
+    for child in node.iter_child_nodes():
+        paths.update(_variable_paths(child, variable_names))
+    return paths
+
+
+def _is_binary(template_path: Path) -> bool:
+    with template_path.open("rb") as handle:
+        prefix = handle.read(BINARY_SNIFF_SIZE)
+    if b"\0" in prefix:
+        return True
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(prefix)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+def _binary_metadata(template_name: str) -> TemplateMetadata:
+    return TemplateMetadata(
+        template_name=template_name,
+        relative_path=template_output_path(template_name),
+        variable_names=frozenset(),
+        dependency_names=frozenset(),
+        has_dynamic_dependencies=False,
+        is_binary=True,
+    )
+
+
+def _inspect_template(
+    environment: Environment,
+    template_path: Path,
+    template_name: str,
+) -> TemplateMetadata:
+    try:
+        if _is_binary(template_path):
+            return _binary_metadata(template_name)
+        source = template_path.read_text()
+        parsed = environment.parse(source)
+    except UnicodeDecodeError:
+        return _binary_metadata(template_name)
+    except TemplateError as exc:
+        raise TemplateRenderError(f"Could not inspect {template_path}: {exc}") from exc
+
+    variable_names = meta.find_undeclared_variables(parsed)
+    dependency_names: set[str] = set()
+    has_dynamic_dependencies = False
+    for dependency in meta.find_referenced_templates(parsed) or ():
+        if dependency is None:
+            has_dynamic_dependencies = True
+            continue
+        dependency_names.add(dependency)
+
+    return TemplateMetadata(
+        template_name=template_name,
+        relative_path=template_output_path(template_name),
+        variable_names=frozenset(variable_names),
+        dependency_names=frozenset(dependency_names),
+        has_dynamic_dependencies=has_dynamic_dependencies,
+        variable_paths=frozenset(_variable_paths(parsed, variable_names)),
+    )
+
+
+def _template_paths(module: Path, ignore: IgnoreMatcher | None) -> list[Path]:
+    if ignore is None:
+        return sorted(path for path in module.rglob("*") if path.is_file())
+    template_paths: list[Path] = []
+    for directory, directory_names, file_names in os.walk(module):
+        directory_path = Path(directory)
+        directory_names[:] = [
+            name
+            for name in directory_names
+            if not ignore.ignores(directory_path / name, is_dir=True)
+        ]
+        template_paths.extend(
+            path
+            for name in file_names
+            if not ignore.ignores(path := directory_path / name) and path.is_file()
+        )
+    return sorted(template_paths)
+
+
+def template_metadata(
+    module: Path,
+    cache: TemplateMetadataCache | None = None,
+    ignore: IgnoreMatcher | None = None,
+) -> dict[str, TemplateMetadata]:
     environment = template_environment(module)
     templates: dict[str, TemplateMetadata] = {}
 
-    for template_path in sorted(path for path in module.rglob("*") if path.is_file()):
+    for template_path in _template_paths(module, ignore):
         template_name = template_path.relative_to(module).as_posix()
+        if cache is None:
+            metadata = _inspect_template(environment, template_path, template_name)
+        else:
+            key = _file_key(template_path)
+            metadata = cache.get(template_path, key)
+            if metadata is None:
+                metadata = _inspect_template(environment, template_path, template_name)
+                cache.store(template_path, key, metadata)
+        templates[template_name] = metadata
+
+    return templates
+
+
+class TemplateStream:
+    def __init__(
+        self,
+        environment: TracingEnvironment,
+        module: Path,
+        metadata: TemplateMetadata,
+        template: Template,
+        variables: dict[str, Any],
+    ) -> None:
+        self.metadata = metadata
+        self.loaded_names: frozenset[str] = frozenset()
+        self._environment = environment
+        self._module = module
+        self._template = template
+        self._variables = variables
+
+    def __iter__(self) -> Iterator[str]:
+        template_name = self.metadata.template_name
+        self._environment.loaded_names.clear()
         try:
-            source = template_path.read_text()
-            parsed = environment.parse(source)
-        except UnicodeDecodeError:
-            print(f"Skipping non-text template: {template_path}")
-            continue
+            yield from self._template.generate(self._variables)
         except TemplateError as exc:
             raise TemplateRenderError(
-                f"Could not inspect {template_path}: {exc}"
+                f"Could not render {self._module / template_name}: {exc}"
             ) from exc
+        self.loaded_names = frozenset(self._environment.loaded_names - {template_name})
 
-        dependency_names: set[str] = set()
-        has_dynamic_dependencies = False
-        for dependency in meta.find_referenced_templates(parsed) or ():
-            if dependency is None:
-                has_dynamic_dependencies = True
-                continue
-            dependency_names.add(dependency)
-
-        templates[template_name] = TemplateMetadata(
-            template_name=template_name,
-            relative_path=template_output_path(template_name),
-            variable_names=frozenset(meta.find_undeclared_variables(parsed)),
-            dependency_names=frozenset(dependency_names),
-            has_dynamic_dependencies=has_dynamic_dependencies,
-        )
 
-    return templates
-
-
-def render_templates(
+def stream_templates(
     module: Path,
     variables: dict[str, Any],
     selected: set[str] | None = None,
-) -> list[RenderedTemplate]:
-    environment = template_environment(module)
-    templates = template_metadata(module)
-    template_names = sorted(selected or templates)
-    rendered_templates: list[RenderedTemplate] = []
+    bytecode_cache: BytecodeCache | None = None,
+    templates: dict[str, TemplateMetadata] | None = None,
+    library: Path | None = None,
+) -> Iterator[TemplateStream]:
+    environment = template_environment(module, bytecode_cache, library)
+    if templates is None:
+        templates = template_metadata(module)
 
-    for template_name in template_names:
+    for template_name in sorted(selected or templates):
         metadata = templates.get(template_name)
-        if metadata is None:
+        if metadata is None or metadata.is_binary:
             continue
         try:
-            content = environment.get_template(template_name).render(variables)
+            template = environment.get_template(template_name)
         except TemplateError as exc:
             raise TemplateRenderError(
                 f"Could not render {module / template_name}: {exc}"
             ) from exc
-        rendered_templates.append(RenderedTemplate(metadata, content))
+        yield TemplateStream(environment, module, metadata, template, variables)
+
 
-    return rendered_templates
+def render_templates(
+    module: Path,
+    variables: dict[str, Any],
+    selected: set[str] | None = None,
+    bytecode_cache: BytecodeCache | None = None,
+    templates: dict[str, TemplateMetadata] | None = None,
+    library: Path | None = None,
+) -> list[RenderedTemplate]:
+    return [
+        RenderedTemplate(stream.metadata, "".join(stream), stream.loaded_names)
+        for stream in stream_templates(
+            module, variables, selected, bytecode_cache, templates, library
+        )
+    ]
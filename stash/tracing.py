@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Any
+
+
+class Tracer:
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = path.open("w")
+        self._handle.write("[\n")
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._tracks: dict[str, int] = {}
+        self._first = True
+
+    def _track_id(self, track: str) -> int:
+        track_id = self._tracks.get(track)
+        if track_id is None:
+            track_id = self._tracks[track] = len(self._tracks) + 1
+            self._write(
+                {
+                    "ph": "M",
+                    "name": "thread_name",
+                    "pid": self._pid,
+                    "tid": track_id,
+                    "args": {"name": track},
+                }
+            )
+        return track_id
+
+    def _write(self, event: dict[str, Any]) -> None:
+        if self._handle.closed:
+            return
+        separator = "" if self._first else ",\n"
+        self._first = False
+        self._handle.write(separator + json.dumps(event, default=str))
+
+    def complete(
+        self,
+        name: str,
+        started: float,
+        finished: float,
+        track: str | None = None,
+        **arguments: Any,
+    ) -> None:
+        with self._lock:
+            self._write(
+                {
+                    "ph": "X",
+                    "name": name,
+                    "pid": self._pid,
+                    "tid": self._track_id(track or threading.current_thread().name),
+                    "ts": started * 1_000_000,
+                    "dur": (finished - started) * 1_000_000,
+                    "args": arguments,
+                }
+            )
+
+    def instant(self, name: str, track: str | None = None, **arguments: Any) -> None:
+        with self._lock:
+            self._write(
+                {
+                    "ph": "i",
+                    "s": "t",
+                    "name": name,
+                    "pid": self._pid,
+                    "tid": self._track_id(track or threading.current_thread().name),
+                    "ts": time.perf_counter() * 1_000_000,
+                    "args": arguments,
+                }
+            )
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        track: str | None = None,
+        **arguments: Any,
+    ) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.complete(name, started, time.perf_counter(), track, **arguments)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._handle.closed:
+                self._handle.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._handle.closed:
+                self._handle.write("\n]\n")
+                self._handle.close()
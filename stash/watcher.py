@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import struct
+
+from inotify.calls import (
+    InotifyError,
+    inotify_add_watch,
+    inotify_init,
+    inotify_rm_watch,
+)
+from inotify.constants import (
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_DELETE_SELF,
+    IN_IGNORED,
+    IN_ISDIR,
+    IN_MODIFY,
+    IN_MOVE_SELF,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+    MASK_LOOKUP,
+)
+
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MODIFY
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_MOVE_SELF
+)
+READ_SIZE = 64 * 1024
+
+_HEADER = struct.Struct("iIII")
+
+
+@dataclass(frozen=True)
+class InotifyHeader:
+    wd: int
+    mask: int
+    cookie: int
+    len: int
+
+
+InotifyEvent = tuple[InotifyHeader, list[str], str, str]
+
+
+@dataclass(frozen=True)
+class Debounce:
+    quiet: float = 0.1
+    max_latency: float = 1.0
+
+
+def _event_path(event: InotifyEvent) -> str:
+    return os.path.join(event[2], event[3])
+
+
+def coalesce_events(events: list[InotifyEvent]) -> list[InotifyEvent]:
+    moved_cookies = {
+        event[0].cookie for event in events if event[0].mask & IN_MOVED_FROM
+    } & {event[0].cookie for event in events if event[0].mask & IN_MOVED_TO}
+    destinations: dict[int, tuple[str, str]] = {}
+    final_paths: dict[str, tuple[str, str]] = {}
+    moved_from: dict[str, int] = {}
+    coalesced: list[InotifyEvent | None] = []
+    for event in reversed(events):
+        header, names, watch_path, filename = event
+        path = _event_path(event)
+        renamed = header.cookie in moved_cookies
+        if header.mask & IN_MOVED_FROM and renamed:
+            final_paths[path] = destinations[header.cookie]
+            moved_from[path] = len(coalesced)
+            coalesced.append(event)
+            continue
+        final = final_paths.get(path)
+        if header.mask & IN_MOVED_TO and renamed:
+            destinations[header.cookie] = final or (watch_path, filename)
+            coalesced.append(None if final is not None else event)
+        elif final is not None:
+            coalesced.append((header, names, *final))
+        else:
+            coalesced.append(event)
+        if header.mask & (IN_CREATE | IN_MOVED_TO):
+            index = moved_from.pop(path, None)
+            if index is not None:
+                coalesced[index] = None
+            final_paths.pop(path, None)
+    coalesced_events = [event for event in reversed(coalesced) if event is not None]
+    first_masks: dict[str, int] = {}
+    last_masks: dict[str, int] = {}
+    for event in coalesced_events:
+        path = _event_path(event)
+        first_masks.setdefault(path, event[0].mask)
+        last_masks[path] = event[0].mask
+    temporary_paths = {
+        path
+        for path, mask in first_masks.items()
+        if mask & (IN_CREATE | IN_MOVED_TO)
+        and last_masks[path] & (IN_DELETE | IN_MOVED_FROM)
+    }
+    return [
+        event for event in coalesced_events if _event_path(event) not in temporary_paths
+    ]
+
+
+def event_names(mask: int) -> list[str]:
+    return [name for bit, name in MASK_LOOKUP.items() if mask & bit]
+
+
+class InotifyWatcher:
+    def __init__(self, mask: int = WATCH_MASK) -> None:
+        self._mask = mask
+        self._fd = inotify_init()
+        os.set_blocking(self._fd, False)
+        os.set_inheritable(self._fd, False)
+        self._watches: dict[int, str] = {}
+        self._paths: dict[str, int] = {}
+        self._recursive: set[str] = set()
+        self._single: set[str] = set()
+        self._buffer = b""
+        self._pending: list[InotifyEvent] = []
+        self._ready = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _watch(self, path: str) -> bool:
+        try:
+            wd = inotify_add_watch(self._fd, path.encode(), self._mask)
+        except InotifyError:
+            return False
+        self._watches[wd] = path
+        self._paths[path] = wd
+        return True
+
+    def add_watch(self, path: Path | str) -> bool:
+        path = os.fspath(path)
+        self._single.add(path)
+        return self._watch(path)
+
+    def add_tree(self, path: Path | str) -> None:
+        path = os.fspath(path)
+        self._recursive.add(path)
+        self._add_directories(path)
+
+    def remove_tree(self, path: Path | str) -> None:
+        path = os.fspath(path)
+        self._recursive.discard(path)
+        for watched_path, wd in list(self._paths.items()):
+            if (
+                watched_path == path or watched_path.startswith(f"{path}{os.sep}")
+            ) and not (
+                watched_path in self._single or self._is_recursive(watched_path)
+            ):
+                try:
+                    inotify_rm_watch(self._fd, wd)
+                except InotifyError:
+                    pass
+                self._forget(wd)
+
+    def set_trees(self, paths: Iterable[Path | str]) -> None:
+        desired = {os.fspath(path) for path in paths}
+        for path in self._recursive - desired:
+            self.remove_tree(path)
+        for path in sorted(desired - self._recursive):
+            self.add_tree(path)
+
+    @property
+    def watch_count(self) -> int:
+        return len(self._watches)
+
+    def _add_directories(self, path: str) -> list[InotifyEvent]:
+        created: list[InotifyEvent] = []
+        pending = [path]
+        while pending:
+            directory = pending.pop()
+            if not self._watch(directory):
+                continue
+            header = InotifyHeader(self._paths[directory], IN_CREATE, 0, 0)
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        else:
+                            created.append(
+                                (header, ["IN_CREATE"], directory, entry.name)
+                            )
+            except OSError:
+                continue
+        return created
+
+    def _is_recursive(self, path: str) -> bool:
+        return any(
+            path == root or path.startswith(f"{root}{os.sep}")
+            for root in self._recursive
+        )
+
+    def _forget(self, wd: int) -> None:
+        path = self._watches.pop(wd, None)
+        if path is not None and self._paths.get(path) == wd:
+            del self._paths[path]
+
+    def _decode(self, data: bytes) -> list[InotifyEvent]:
+        buffer = self._buffer + data
+        events: list[InotifyEvent] = []
+        offset = 0
+        while len(buffer) - offset >= _HEADER.size:
+            header = InotifyHeader(*_HEADER.unpack_from(buffer, offset))
+            end = offset + _HEADER.size + header.len
+            if end > len(buffer):
+                break
+            filename = buffer[offset + _HEADER.size : end].rstrip(b"\0")
+            offset = end
+            if header.mask & IN_Q_OVERFLOW:
+                events.append((header, event_names(header.mask), "", ""))
+                continue
+            path = self._watches.get(header.wd)
+            if header.mask & IN_IGNORED:
+                self._forget(header.wd)
+                continue
+            if path is None:
+                continue
+            name = os.fsdecode(filename)
+            events.append((header, event_names(header.mask), path, name))
+            if (
+                header.mask & IN_ISDIR
+                and header.mask & (IN_CREATE | IN_MOVED_TO)
+                and self._is_recursive(os.path.join(path, name))
+            ):
+                events.extend(self._add_directories(os.path.join(path, name)))
+        self._buffer = buffer[offset:]
+        return events
+
+    def _read(self) -> None:
+        while True:
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            self._pending.extend(self._decode(data))
+        if self._pending:
+            self._ready.set()
+
+    def start(self) -> None:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._loop.add_reader(self._fd, self._read)
+
+    def take_events(self) -> list[InotifyEvent]:
+        self._read()
+        events, self._pending = self._pending, []
+        self._ready.clear()
+        return events
+
+    async def read_events(
+        self,
+        stop_event: asyncio.Event | None = None,
+    ) -> list[InotifyEvent]:
+        self.start()
+        while not self._pending:
+            if stop_event is not None and stop_event.is_set():
+                return []
+            waiters = {asyncio.ensure_future(self._ready.wait())}
+            if stop_event is not None:
+                waiters.add(asyncio.ensure_future(stop_event.wait()))
+            try:
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+            self._ready.clear()
+        return self.take_events()
+
+    async def read_quiet(
+        self,
+        quiet: float,
+        deadline: float,
+        stop_event: asyncio.Event | None = None,
+    ) -> list[InotifyEvent]:
+        loop = asyncio.get_running_loop()
+        events: list[InotifyEvent] = []
+        while (timeout := min(quiet, deadline - loop.time())) > 0:
+            try:
+                batch = await asyncio.wait_for(self.read_events(stop_event), timeout)
+            except TimeoutError:
+                break
+            if not batch:
+                break
+            events.extend(batch)
+        return events
+
+    def close(self) -> None:
+        if self._loop is not None:
+            self._loop.remove_reader(self._fd)
+            self._loop = None
+        for wd in list(self._watches):
+            try:
+                inotify_rm_watch(self._fd, wd)
+            except InotifyError:
+                pass
+        self._watches.clear()
+        self._paths.clear()
+        os.close(self._fd)
@@ -0,0 +1,67 @@
+import asyncio
+from pathlib import Path
+import threading
+
+import pytest
+
+from stash.actor import CancelToken, RenderActor, RenderCancelledError
+from stash.live import render_live
+from stash.stats import StatsRecorder
+
+
+def test_render_actor_supersedes_requests_with_the_same_key():
+    async def run():
+        actor = RenderActor()
+        started = threading.Event()
+        release = threading.Event()
+        calls: list[str] = []
+
+        def slow(cancel: CancelToken) -> str:
+            calls.append("slow")
+            started.set()
+            release.wait(1)
+            cancel.check()
+            return "slow"
+
+        def record(name: str):
+            def job(cancel: CancelToken) -> str:
+                calls.append(name)
+                return name
+
+            return job
+
+        first = asyncio.ensure_future(actor.run(slow, key="update"))
+        await asyncio.to_thread(started.wait, 1)
+        second = asyncio.ensure_future(actor.run(record("second"), key="update"))
+        await asyncio.sleep(0)
+        third = asyncio.ensure_future(actor.run(record("third"), key="update"))
+        await asyncio.sleep(0)
+        release.set()
+        try:
+            with pytest.raises(RenderCancelledError):
+                await first
+            with pytest.raises(RenderCancelledError):
+                await second
+            assert await third == "third"
+            assert calls == ["slow", "third"]
+        finally:
+            actor.close()
+
+    asyncio.run(run())
+
+
+def test_render_live_stops_at_template_boundary_when_cancelled(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("profile")
+    config = {"dotfiles": {"shell": {"target": (tmp_path / "target").as_posix()}}}
+    cancel = CancelToken()
+    cancel.cancel()
+    stats = StatsRecorder()
+
+    with pytest.raises(RenderCancelledError):
+        render_live(config, dotfiles, tmp_path / "live", cancel=cancel, stats=stats)
+
+    assert stats.counters()["render_cancellations"] == 1
+    assert not (tmp_path / "live" / "shell" / ".profile").exists()
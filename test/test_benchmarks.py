@@ -0,0 +1,22 @@
+from benchmarks.suite import regressions, run_suite
+from benchmarks.synthetic import SyntheticSpec
+
+
+def test_benchmark_suite_times_every_scenario():
+    results = run_suite(SyntheticSpec(modules=2, templates=3, include_depth=2), 1)
+
+    assert set(results) == {
+        "full_render",
+        "reload",
+        "single_edit",
+        "variable_change",
+        "theme_switch",
+        "metadata_scan",
+    }
+
+
+def test_regressions_compare_against_baseline_threshold():
+    baseline = {"single_edit": 0.010, "reload": 0.100}
+    results = {"single_edit": 0.013, "reload": 0.110, "full_render": 1.0}
+
+    assert regressions(results, baseline, 0.25) == {"single_edit": (0.010, 0.013)}
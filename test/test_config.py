@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import yaml
+
+from stash.config import CachedConfig, ConfigCache, diff_configs
+
+
+def test_config_cache_reparses_only_changed_files(tmp_path: Path, monkeypatch):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("variables:\n  editor: vim\n")
+    cache = ConfigCache(config_path)
+    loads = 0
+    original_load = yaml.load
+
+    def counting_load(*args, **kwargs):
+        nonlocal loads
+        loads += 1
+        return original_load(*args, **kwargs)
+
+    monkeypatch.setattr(yaml, "load", counting_load)
+
+    config = cache.load()
+    assert cache.load() is config
+    assert loads == 1
+
+    variables = config.template_variables(tmp_path)
+    variables["editor"] = "emacs"
+    assert config.template_variables(tmp_path)["editor"] == "vim"
+
+    config_path.write_text("variables:\n  editor: nvim\n")
+    assert cache.load().template_variables(tmp_path)["editor"] == "nvim"
+    assert loads == 2
+
+
+def test_diff_configs_reports_changed_variables_and_modules():
+    colors = {f"base{index:02X}": f"#{index:06x}" for index in range(16)}
+    old_config = CachedConfig(
+        {
+            "variables": {"hosts": {"web": {"ip": "10.0.0.1"}}, "editor": "vim"},
+            "theme": "dark",
+            "themes": {"dark": colors},
+            "dotfiles": {"shell": {"target": "~/.shell"}, "git": {}},
+        }
+    )
+    new_config = CachedConfig(
+        {
+            "variables": {"hosts": {"web": {"ip": "10.0.0.2"}}, "editor": "vim"},
+            "theme": "dark",
+            "themes": {"dark": colors | {"base08": "#ff0000"}},
+            "dotfiles": {"shell": {"target": "~/.zsh"}, "editor": {}},
+        }
+    )
+
+    config_diff = diff_configs(old_config, new_config, "dark", "dark")
+
+    assert config_diff.variables == {"hosts.web.ip", "colors.base08"}
+    assert config_diff.added_modules == {"editor"}
+    assert config_diff.removed_modules == {"git"}
+    assert config_diff.retargeted_modules == {"shell"}
+    assert not config_diff.library_changed
+    assert diff_configs(new_config, new_config, "dark", "dark").is_empty
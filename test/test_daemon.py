@@ -1,6 +1,10 @@
+import asyncio
 from pathlib import Path
+import threading
 
-from stash.daemon import _is_relevant
+from stash.actor import CancelToken, RenderActor
+from stash.daemon import PendingUpdates, _changed_paths, _is_relevant
+from stash.ignore import IgnoreMatcher
 from stash.live import render_live
 
 
@@ -17,6 +21,22 @@ def test_daemon_ignores_template_read_events(tmp_path: Path):
     assert _is_relevant([write_event], config_path, [module])
 
 
+def test_daemon_skips_ignored_editor_files(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    config_path = dotfiles / "config.yaml"
+    events = [
+        (None, ["IN_CREATE"], module.as_posix(), ".profile.swp"),
+        (None, ["IN_CLOSE_WRITE"], module.as_posix(), "4913"),
+        (None, ["IN_CLOSE_WRITE"], module.as_posix(), "profile"),
+    ]
+
+    assert _changed_paths(events, config_path, [module], IgnoreMatcher(dotfiles)) == {
+        module / "profile"
+    }
+
+
 def test_render_live_updates_links_without_generations(tmp_path: Path):
     dotfiles = tmp_path / "dotfiles"
     module = dotfiles / "shell"
@@ -48,3 +68,41 @@ def test_render_live_updates_links_without_generations(tmp_path: Path):
         live_root / "shell" / "settings.ini"
     ).resolve()
     assert (live_root / "shell" / "settings.ini").read_text() == "second"
+
+
+def test_pending_updates_carry_cancelled_paths_into_the_next_render(tmp_path: Path):
+    first_path = tmp_path / "first"
+    second_path = tmp_path / "second"
+
+    async def run():
+        actor = RenderActor()
+        started = threading.Event()
+        release = threading.Event()
+        rendered: list[tuple[set[Path], bool]] = []
+
+        def update_job(changed_paths: set[Path], full: bool):
+            def job(cancel: CancelToken) -> None:
+                if not started.is_set():
+                    started.set()
+                    release.wait(1)
+                cancel.check()
+                rendered.append((changed_paths, full))
+
+            return job
+
+        updates = PendingUpdates(actor.run, update_job)
+        try:
+            first = updates.schedule({first_path}, False)
+            await asyncio.to_thread(started.wait, 1)
+            second = updates.schedule({second_path}, True)
+            await asyncio.sleep(0)
+            release.set()
+            await asyncio.gather(first, second)
+        finally:
+            actor.close()
+
+        assert rendered == [({first_path, second_path}, True)]
+        assert updates.paths == set()
+        assert not updates.full
+
+    asyncio.run(run())
@@ -154,6 +154,58 @@ def test_get_theme_returns_active_name():
     asyncio.run(run())
 
 
+def test_reconcile_returns_applied_changes():
+    async def run():
+        async def reload_handler():
+            return True
+
+        async def set_theme_handler(name: str):
+            return bool(name)
+
+        async def reconcile_handler():
+            return ["create /home/user/.profile"]
+
+        interface = StashInterface(
+            reload_handler,
+            set_theme_handler,
+            asyncio.Event(),
+            FakeHookRunner(),
+            reconcile_handler=reconcile_handler,
+        )
+
+        result = await getattr(interface.Reconcile, "__wrapped__")(interface)
+
+        assert result == ["create /home/user/.profile"]
+
+    asyncio.run(run())
+
+
+def test_get_stats_returns_json():
+    async def run():
+        async def reload_handler():
+            return True
+
+        async def set_theme_handler(name: str):
+            return bool(name)
+
+        async def get_stats_handler():
+            return '{"counters": {"renders": 1}}'
+
+        interface = StashInterface(
+            reload_handler,
+            set_theme_handler,
+            asyncio.Event(),
+            FakeHookRunner(),
+            get_stats_handler=get_stats_handler,
+        )
+
+        result = await getattr(interface.GetStats, "__wrapped__")(interface)
+
+        assert result == '{"counters": {"renders": 1}}'
+
+    asyncio.run(run())
+
+
 @pytest.mark.parametrize(
     ("failed_phase", "action_runs"),
     [("pre", False), ("post", True)],
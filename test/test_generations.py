@@ -0,0 +1,130 @@
+import os
+from pathlib import Path
+import time
+
+import pytest
+
+from stash.generations import CURRENT_LINK, GENERATIONS_DIRECTORY, current_generation
+from stash.live import DaemonError, render_live
+
+
+def _write_module(tmp_path: Path) -> tuple[Path, Path, Path, dict]:
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("{{ value }}")
+    (module / "dot_aliases").write_text("static")
+    target = tmp_path / "target"
+    config = {
+        "variables": {"value": "first"},
+        "dotfiles": {"shell": {"target": target.as_posix()}},
+    }
+    return dotfiles, tmp_path / "live", target, config
+
+
+def _wait_for_cleanup(live_root: Path) -> list[Path]:
+    deadline = time.monotonic() + 5
+    generations = list((live_root / GENERATIONS_DIRECTORY).iterdir())
+    while len(generations) > 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+        generations = list((live_root / GENERATIONS_DIRECTORY).iterdir())
+    return generations
+
+
+def test_render_live_switches_generations(tmp_path: Path):
+    dotfiles, live_root, target, config = _write_module(tmp_path)
+
+    state = render_live(config, dotfiles, live_root, generations=True)
+    first_generation = current_generation(live_root)
+    aliases_inode = (live_root / "shell" / ".aliases").stat().st_ino
+
+    assert os.readlink(live_root / "shell") == f"{CURRENT_LINK}/shell"
+    assert (target / ".profile").read_text() == "first"
+
+    config["variables"]["value"] = "second"
+    render_live(
+        config,
+        dotfiles,
+        live_root,
+        state,
+        changed_variables={"value"},
+        generations=True,
+    )
+
+    assert current_generation(live_root) != first_generation
+    assert (target / ".profile").read_text() == "second"
+    assert (live_root / "shell" / ".aliases").stat().st_ino == aliases_inode
+    assert _wait_for_cleanup(live_root) == [current_generation(live_root)]
+
+
+def test_render_live_keeps_generation_when_nothing_changed(tmp_path: Path):
+    dotfiles, live_root, _, config = _write_module(tmp_path)
+    state = render_live(config, dotfiles, live_root, generations=True)
+    generation = current_generation(live_root)
+
+    render_live(config, dotfiles, live_root, state, generations=True)
+
+    assert current_generation(live_root) == generation
+    assert _wait_for_cleanup(live_root) == [generation]
+
+
+def test_render_live_discards_failed_generation(tmp_path: Path):
+    dotfiles, live_root, target, config = _write_module(tmp_path)
+    state = render_live(config, dotfiles, live_root, generations=True)
+    generation = current_generation(live_root)
+    profile = dotfiles / "shell" / "dot_profile"
+    profile.write_text("{{ missing }}")
+
+    with pytest.raises(DaemonError):
+        render_live(
+            config,
+            dotfiles,
+            live_root,
+            state,
+            changed_paths={profile.resolve()},
+            generations=True,
+        )
+
+    assert current_generation(live_root) == generation
+    assert list((live_root / GENERATIONS_DIRECTORY).iterdir()) == [generation]
+    assert (target / ".profile").read_text() == "first"
+
+
+def test_render_live_migrates_live_directories_to_generations(tmp_path: Path):
+    dotfiles, live_root, target, config = _write_module(tmp_path)
+    state = render_live(config, dotfiles, live_root)
+
+    render_live(config, dotfiles, live_root, state, generations=True)
+
+    assert (live_root / "shell").is_symlink()
+    assert (target / ".profile").read_text() == "first"
+    assert (target / ".aliases").read_text() == "static"
+
+
+def test_render_live_syncs_generation_before_switching(tmp_path: Path, monkeypatch):
+    dotfiles, live_root, _, config = _write_module(tmp_path)
+    state = render_live(config, dotfiles, live_root, generations=True)
+    synced: list[Path] = []
+    fsync = os.fsync
+
+    def record_fsync(descriptor: int) -> None:
+        synced.append(Path(os.readlink(f"/proc/self/fd/{descriptor}")))
+        fsync(descriptor)
+
+    monkeypatch.setattr("os.fsync", record_fsync)
+    monkeypatch.setattr("os.sync", lambda: pytest.fail("os.sync was called"))
+    config["variables"]["value"] = "second"
+    render_live(
+        config,
+        dotfiles,
+        live_root,
+        state,
+        changed_variables={"value"},
+        generations=True,
+    )
+
+    generation = current_generation(live_root)
+    assert generation / "shell" / ".profile" in synced
+    assert generation / "shell" / ".aliases" not in synced
+    assert generation in synced
+    assert synced[-1] == live_root.resolve()
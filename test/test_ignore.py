@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from stash.ignore import IgnoreMatcher, load_ignore
+from stash.templates import template_metadata
+
+
+def test_ignore_matcher_follows_gitignore_rules():
+    root = Path("/dotfiles")
+    matcher = IgnoreMatcher(
+        root, ["build/", "*.log", "!keep.log", "/notes", "docs/**/*.md"]
+    )
+
+    assert matcher.ignores(root / "shell" / ".profile.swp")
+    assert matcher.ignores(root / "shell" / "4913")
+    assert matcher.ignores(root / "shell" / "profile~")
+    assert matcher.ignores(root / "shell" / "build" / "output")
+    assert matcher.ignores(root / "shell" / "build", is_dir=True)
+    assert not matcher.ignores(root / "shell" / "build")
+    assert matcher.ignores(root / "shell" / "debug.log")
+    assert not matcher.ignores(root / "shell" / "keep.log")
+    assert matcher.ignores(root / "notes")
+    assert not matcher.ignores(root / "shell" / "notes")
+    assert matcher.ignores(root / "docs" / "a" / "b.md")
+    assert not matcher.ignores(root / "shell" / "profile")
+    assert not matcher.ignores(Path("/elsewhere") / "debug.log")
+    assert matcher.ignores(Path("/elsewhere") / ".config.yaml.swp")
+
+
+def test_template_metadata_skips_ignored_files(tmp_path: Path):
+    module = tmp_path / "shell"
+    (module / "dist").mkdir(parents=True)
+    (module / "profile").write_text("profile")
+    (module / ".profile.swp").write_bytes(b"\0swap")
+    (module / "4913").write_text("")
+    (module / "dist" / "bundle").write_text("bundle")
+    (tmp_path / ".stashignore").write_text("dist/\n")
+
+    templates = template_metadata(module, ignore=load_ignore(tmp_path))
+
+    assert set(templates) == {"profile"}
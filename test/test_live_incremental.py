@@ -1,6 +1,11 @@
 from pathlib import Path
 
-from stash.live import _write_live_file, render_live
+import pytest
+
+from stash import deployment
+from stash.config import CachedConfig, diff_configs
+from stash.live import DaemonError, _write_live_file, render_live
+from stash.stats import StatsRecorder
 
 
 def test_render_live_rerenders_only_templates_using_changed_variables(
@@ -110,3 +115,470 @@ def test_render_live_rerenders_templates_depending_on_changed_include(
     assert writes == [Path("shell/.profile"), Path("shell/shared.txt")]
     assert (live_root / "shell" / ".profile").read_text() == "second"
     assert (live_root / "shell" / "shared.txt").read_text() == "second"
+
+
+def test_render_live_skips_unchanged_outputs_across_full_renders(
+    tmp_path: Path,
+    monkeypatch,
+):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("{{ value }}")
+    (module / "dot_aliases").write_text("static")
+    target = tmp_path / "target"
+    live_root = tmp_path / "live"
+    config = {
+        "variables": {"value": "first"},
+        "dotfiles": {"shell": {"target": target.as_posix()}},
+    }
+
+    state = render_live(config, dotfiles, live_root)
+    writes: list[Path] = []
+    links: list[Path] = []
+
+    def write_live_file(path: Path, content: str) -> None:
+        writes.append(path.relative_to(live_root))
+        _write_live_file(path, content)
+
+    def atomic_symlink(link_path: Path, rendered_path: Path) -> None:
+        links.append(link_path)
+        deployment.atomic_symlink(link_path, rendered_path)
+
+    monkeypatch.setattr("stash.live._write_live_file", write_live_file)
+    monkeypatch.setattr("stash.live.atomic_symlink", atomic_symlink)
+    render_live(config, dotfiles, live_root)
+    render_live(config, dotfiles, live_root, state)
+
+    assert writes == []
+    assert links == []
+
+    config["variables"]["value"] = "second"
+    render_live(config, dotfiles, live_root, state)
+
+    assert writes == [Path("shell/.profile")]
+    assert links == []
+    assert (target / ".profile").read_text() == "second"
+
+
+def test_render_live_rewrites_modified_live_file(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("rendered")
+    target = tmp_path / "target"
+    live_root = tmp_path / "live"
+    config = {"dotfiles": {"shell": {"target": target.as_posix()}}}
+
+    state = render_live(config, dotfiles, live_root)
+    (live_root / "shell" / ".profile").write_text("edited by hand")
+    (target / ".profile").unlink()
+    render_live(config, dotfiles, live_root, state)
+
+    assert (target / ".profile").read_text() == "rendered"
+
+
+def test_render_live_renders_modules_in_worker_processes(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    config = {"variables": {"value": "parallel"}, "dotfiles": {}}
+    for name in ("shell", "editor", "terminal"):
+        module = dotfiles / name
+        module.mkdir(parents=True)
+        (module / "settings").write_text(f"{name} {{{{ value }}}}")
+        config["dotfiles"][name] = {"target": (tmp_path / "target" / name).as_posix()}
+    live_root = tmp_path / "live"
+
+    state = render_live(config, dotfiles, live_root, jobs=2)
+
+    assert state.module_names == {"shell", "editor", "terminal"}
+    for name in ("shell", "editor", "terminal"):
+        assert (tmp_path / "target" / name / "settings").read_text() == (
+            f"{name} parallel"
+        )
+
+
+def test_render_live_uses_traced_includes_for_dynamic_templates(
+    tmp_path: Path,
+    monkeypatch,
+):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    first = module / "first.txt"
+    second = module / "second.txt"
+    first.write_text("first")
+    second.write_text("second")
+    (module / "dot_profile").write_text("{% include part %}")
+    live_root = tmp_path / "live"
+    config = {
+        "variables": {"part": "first.txt"},
+        "dotfiles": {"shell": {"target": (tmp_path / "target").as_posix()}},
+    }
+
+    state = render_live(config, dotfiles, live_root)
+    writes: list[Path] = []
+
+    def write_live_file(path: Path, content: str) -> None:
+        writes.append(path.relative_to(live_root))
+        _write_live_file(path, content)
+
+    monkeypatch.setattr("stash.live._write_live_file", write_live_file)
+    second.write_text("second changed")
+    state = render_live(
+        config, dotfiles, live_root, state, changed_paths={second.resolve()}
+    )
+
+    assert writes == [Path("shell/second.txt")]
+
+    writes.clear()
+    first.write_text("first changed")
+    render_live(config, dotfiles, live_root, state, changed_paths={first.resolve()})
+
+    assert writes == [Path("shell/.profile"), Path("shell/first.txt")]
+    assert (live_root / "shell" / ".profile").read_text() == "first changed"
+
+
+def test_render_live_rerenders_library_dependents_across_modules(
+    tmp_path: Path,
+    monkeypatch,
+):
+    dotfiles = tmp_path / "dotfiles"
+    library = dotfiles / "lib"
+    library.mkdir(parents=True)
+    (library / "header.j2").write_text("# {% include 'banner.j2' %}")
+    banner = library / "banner.j2"
+    banner.write_text("first")
+    for module_name, content in (
+        ("shell", "{% include 'header.j2' %}\nshell"),
+        ("git", "{% include 'header.j2' %}\ngit"),
+        ("vim", "static"),
+    ):
+        (dotfiles / module_name).mkdir()
+        (dotfiles / module_name / "config").write_text(content)
+    live_root = tmp_path / "live"
+    config = {
+        "library_dir": "lib",
+        "dotfiles": {
+            name: {"target": (tmp_path / "target" / name).as_posix()}
+            for name in ("shell", "git", "vim")
+        },
+    }
+
+    state = render_live(config, dotfiles, live_root)
+    writes: list[Path] = []
+
+    def write_live_file(path: Path, content: str) -> None:
+        writes.append(path.relative_to(live_root))
+        _write_live_file(path, content)
+
+    monkeypatch.setattr("stash.live._write_live_file", write_live_file)
+    banner.write_text("second")
+    next_state = render_live(
+        config,
+        dotfiles,
+        live_root,
+        state,
+        changed_paths={banner.resolve()},
+    )
+
+    assert sorted(writes) == [Path("git/config"), Path("shell/config")]
+    assert (live_root / "shell" / "config").read_text() == "# second\nshell"
+    assert not (live_root / "lib").exists()
+    assert library.resolve() in next_state.source_paths
+    assert next_state.dependent_modules({"header.j2"}) == {"shell", "git"}
+
+
+def test_render_live_rerenders_library_dependents_on_changed_variables(
+    tmp_path: Path,
+    monkeypatch,
+):
+    dotfiles = tmp_path / "dotfiles"
+    library = dotfiles / "lib"
+    library.mkdir(parents=True)
+    (library / "colors.j2").write_text("{{ value }}")
+    (library / "header.j2").write_text("# {% include 'colors.j2' %}")
+    for module_name, content in (
+        ("shell", "{% include 'header.j2' %}"),
+        ("vim", "static"),
+    ):
+        (dotfiles / module_name).mkdir()
+        (dotfiles / module_name / "rc").write_text(content)
+    live_root = tmp_path / "live"
+    config = {
+        "library_dir": "lib",
+        "variables": {"value": "first"},
+        "dotfiles": {
+            name: {"target": (tmp_path / "target" / name).as_posix()}
+            for name in ("shell", "vim")
+        },
+    }
+
+    state = render_live(config, dotfiles, live_root)
+    writes: list[Path] = []
+
+    def write_live_file(path: Path, content: str) -> None:
+        writes.append(path.relative_to(live_root))
+        _write_live_file(path, content)
+
+    monkeypatch.setattr("stash.live._write_live_file", write_live_file)
+    config["variables"]["value"] = "second"
+    render_live(
+        config,
+        dotfiles,
+        live_root,
+        state,
+        changed_paths=set(),
+        changed_variables={"value"},
+    )
+
+    assert writes == [Path("shell/rc")]
+    assert (live_root / "shell" / "rc").read_text() == "# second"
+
+
+def test_render_live_shares_unchanged_modules_between_states(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    for module_name in ("shell", "git"):
+        (dotfiles / module_name).mkdir(parents=True)
+        (dotfiles / module_name / "config").write_text(module_name)
+    live_root = tmp_path / "live"
+    config = {
+        "dotfiles": {
+            name: {"target": (tmp_path / "target" / name).as_posix()}
+            for name in ("shell", "git")
+        },
+    }
+    state = render_live(config, dotfiles, live_root)
+    edited = (dotfiles / "shell" / "config").resolve()
+    edited.write_text("edited")
+
+    next_state = render_live(
+        config,
+        dotfiles,
+        live_root,
+        state,
+        changed_paths={edited},
+    )
+
+    assert next_state.modules["git"] is state.modules["git"]
+    assert next_state.modules["shell"] is not state.modules["shell"]
+    assert next_state.active_links == state.active_links
+    assert (live_root / "shell" / "config").read_text() == "edited"
+
+
+def test_render_live_deploys_binary_files(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "fonts"
+    module.mkdir(parents=True)
+    font = module / "font.ttf"
+    font.write_bytes(b"\x00\x01\x00\x00\xff")
+    (module / "fonts.conf").write_text("{{ value }}")
+    target = tmp_path / "target"
+    live_root = tmp_path / "live"
+    config = {
+        "variables": {"value": "conf"},
+        "dotfiles": {"fonts": {"target": target.as_posix()}},
+    }
+
+    state = render_live(config, dotfiles, live_root)
+
+    assert (target / "font.ttf").read_bytes() == b"\x00\x01\x00\x00\xff"
+    assert not (target / "font.ttf").samefile(font)
+    assert (target / "fonts.conf").read_text() == "conf"
+
+    replacement = module / ".font.ttf.new"
+    replacement.write_bytes(b"\x00\x02")
+    replacement.replace(font)
+    render_live(
+        config,
+        dotfiles,
+        live_root,
+        state,
+        changed_paths={font.resolve()},
+    )
+
+    assert (target / "font.ttf").read_bytes() == b"\x00\x02"
+    assert not (live_root / "fonts" / ".font.ttf.tmp").exists()
+
+
+def test_render_live_streams_large_outputs_to_live_file(
+    tmp_path: Path,
+    monkeypatch,
+):
+    monkeypatch.setattr("stash.live.STREAM_BUFFER_SIZE", 16)
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "hosts"
+    module.mkdir(parents=True)
+    (module / "hosts").write_text("{% for host in hosts %}{{ host }}\n{% endfor %}")
+    (module / "broken").write_text("{% for host in hosts %}{{ host }}\n{% endfor %}")
+    live_root = tmp_path / "live"
+    config = {
+        "variables": {"hosts": [f"host{index}" for index in range(100)]},
+        "dotfiles": {"hosts": {"target": (tmp_path / "target").as_posix()}},
+    }
+    expected = "".join(f"host{index}\n" for index in range(100))
+
+    state = render_live(config, dotfiles, live_root)
+    live_file = live_root / "hosts" / "hosts"
+    inode = live_file.stat().st_ino
+    render_live(config, dotfiles, live_root, state)
+
+    assert live_file.read_text() == expected
+    assert live_file.stat().st_ino == inode
+    assert not (live_root / "hosts" / ".hosts.tmp").exists()
+
+    (module / "broken").write_text(
+        "{% for host in hosts %}{{ host }}\n{% endfor %}{{ hosts.missing }}"
+    )
+    with pytest.raises(DaemonError, match="broken"):
+        render_live(config, dotfiles, live_root, state)
+    assert not (live_root / "hosts" / ".broken.tmp").exists()
+
+
+def test_render_live_adds_and_removes_modules_incrementally(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    for module_name in ("shell", "editor", "git"):
+        (dotfiles / module_name).mkdir(parents=True)
+        (dotfiles / module_name / "config").write_text(module_name)
+    live_root = tmp_path / "live"
+    old_config = CachedConfig(
+        {
+            "dotfiles": {
+                "shell": {"target": (tmp_path / "shell").as_posix()},
+                "editor": {"target": (tmp_path / "editor").as_posix()},
+            }
+        }
+    )
+    new_config = CachedConfig(
+        {
+            "dotfiles": {
+                "shell": {"target": (tmp_path / "shell").as_posix()},
+                "git": {"target": (tmp_path / "git").as_posix()},
+            }
+        }
+    )
+    stats = StatsRecorder()
+    state = render_live(old_config.data, dotfiles, live_root, stats=stats)
+
+    config_diff = diff_configs(old_config, new_config)
+    assert config_diff.added_modules == {"git"}
+    assert config_diff.removed_modules == {"editor"}
+    next_state = render_live(
+        new_config.data,
+        dotfiles,
+        live_root,
+        state,
+        changed_paths=set(),
+        config_diff=config_diff,
+        stats=stats,
+    )
+
+    assert stats.counters()["incremental_renders"] == 1
+    assert next_state.modules["shell"] is state.modules["shell"]
+    assert (tmp_path / "git" / "config").read_text() == "git"
+    assert not (tmp_path / "editor" / "config").exists()
+    assert not (live_root / "editor").exists()
+    assert next_state.source_paths == {
+        (dotfiles / "shell").resolve(),
+        (dotfiles / "git").resolve(),
+    }
+
+
+def test_render_live_skips_module_scan_for_empty_config_diff(
+    tmp_path: Path,
+    monkeypatch,
+):
+    dotfiles = tmp_path / "dotfiles"
+    (dotfiles / "shell").mkdir(parents=True)
+    (dotfiles / "shell" / "config").write_text("shell")
+    config = CachedConfig(
+        {"dotfiles": {"shell": {"target": (tmp_path / "shell").as_posix()}}}
+    )
+    live_root = tmp_path / "live"
+    state = render_live(config.data, dotfiles, live_root)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("modules were scanned")
+
+    monkeypatch.setattr("stash.live._module_changes", fail)
+    next_state = render_live(
+        config.data,
+        dotfiles,
+        live_root,
+        state,
+        changed_paths=set(),
+        config_diff=diff_configs(config, config),
+    )
+
+    assert next_state is state
+
+
+def test_render_live_uses_precomputed_template_variables(
+    tmp_path: Path,
+    monkeypatch,
+):
+    dotfiles = tmp_path / "dotfiles"
+    (dotfiles / "shell").mkdir(parents=True)
+    (dotfiles / "shell" / "config").write_text("{{ value }}")
+    config = CachedConfig(
+        {
+            "variables": {"value": "cached"},
+            "dotfiles": {"shell": {"target": (tmp_path / "shell").as_posix()}},
+        }
+    )
+    variables = config.template_variables(dotfiles)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("template variables were recomputed")
+
+    monkeypatch.setattr("stash.live.template_variables", fail)
+    render_live(config.data, dotfiles, tmp_path / "live", variables=variables)
+
+    assert (tmp_path / "shell" / "config").read_text() == "cached"
+
+
+def test_render_live_rerenders_method_calls_on_changed_variables(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "get").write_text("{{ palette.get('base00') }}")
+    (module / "items").write_text(
+        "{% for name, value in palette.items() %}{{ value }}{% endfor %}"
+    )
+    live_root = tmp_path / "live"
+    config = {
+        "variables": {"palette": {"base00": "111111"}},
+        "dotfiles": {"shell": {"target": (tmp_path / "target").as_posix()}},
+    }
+    state = render_live(config, dotfiles, live_root)
+
+    config["variables"]["palette"] = {"base00": "222222"}
+    render_live(
+        config,
+        dotfiles,
+        live_root,
+        state,
+        changed_paths=set(),
+        changed_variables={"palette.base00"},
+    )
+
+    assert (live_root / "shell" / "get").read_text() == "222222"
+    assert (live_root / "shell" / "items").read_text() == "222222"
+
+
+def test_render_live_rerenders_when_missing_include_is_created(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("{% include 'local.j2' ignore missing %}")
+    live_root = tmp_path / "live"
+    config = {
+        "dotfiles": {"shell": {"target": (tmp_path / "target").as_posix()}},
+    }
+    state = render_live(config, dotfiles, live_root)
+    assert (live_root / "shell" / ".profile").read_text() == ""
+
+    local = module / "local.j2"
+    local.write_text("local")
+    render_live(config, dotfiles, live_root, state, changed_paths={local.resolve()})
+
+    assert (live_root / "shell" / ".profile").read_text() == "local"
@@ -11,12 +11,22 @@ from stash.dbus_service import get_dbus_commands
     [
         (["adopt", "/tmp/example"], main.adopt_command),
         (["daemon"], main.daemon_command),
+        (["daemon", "--jobs", "4"], main.daemon_command),
+        (["daemon", "--generations"], main.daemon_command),
+        (["daemon", "--metrics-file", "/tmp/stash.prom"], main.daemon_command),
+        (["daemon", "--trace", "/tmp/stash.json"], main.daemon_command),
+        (
+            ["daemon", "--debounce-quiet", "0.2", "--debounce-max", "2"],
+            main.daemon_command,
+        ),
         (["systemd-install"], main.systemd_install_command),
         (["ping"], main.dbus_command),
         (["reload"], main.dbus_command),
         (["set-theme", "kanagawa"], main.dbus_command),
         (["get-theme"], main.dbus_command),
         (["list-themes"], main.dbus_command),
+        (["reconcile"], main.dbus_command),
+        (["get-stats"], main.dbus_command),
         (["stop"], main.dbus_command),
     ],
 )
@@ -40,6 +50,8 @@ def test_dbus_commands_are_generated_from_decorated_methods():
         "set-theme",
         "get-theme",
         "list-themes",
+        "reconcile",
+        "get-stats",
         "stop",
     }
     assert commands["set-theme"].method_name == "SetTheme"
@@ -0,0 +1,99 @@
+from pathlib import Path
+
+from stash.live import render_live
+from stash.metrics import format_metrics, write_metrics
+from stash.snapshot import restore_live
+from stash.stats import StatsRecorder
+
+
+def test_write_metrics_exports_prometheus_text(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("{{ value }}")
+    (module / "dot_aliases").write_text("static")
+    config = {
+        "variables": {"value": "first"},
+        "dotfiles": {"shell": {"target": (tmp_path / "target").as_posix()}},
+    }
+    live_root = tmp_path / "live"
+    stats = StatsRecorder()
+    state = render_live(config, dotfiles, live_root, stats=stats)
+    render_live(config, dotfiles, live_root, state, changed_paths=set(), stats=stats)
+    stats.observe("hooks", 0.002)
+    metrics_path = tmp_path / "metrics" / "stash.prom"
+
+    write_metrics(metrics_path, stats)
+
+    lines = metrics_path.read_text().splitlines()
+    assert 'stash_latency_seconds_count{operation="render"} 2' in lines
+    assert 'stash_phase_duration_seconds_bucket{phase="hooks",le="0.0025"} 1' in lines
+    assert "# TYPE stash_templates_rendered_total counter" in lines
+    assert "stash_templates_rendered_total 2" in lines
+    assert "stash_incremental_render_ratio 0.5" in lines
+    assert "stash_live_files 2" in lines
+    assert "stash_live_size_bytes 11" in lines
+    assert not any(line.startswith(("# UNIT", "# EOF")) for line in lines)
+    assert not (metrics_path.parent / ".stash.prom.tmp").exists()
+
+
+def test_format_metrics_tracks_live_tree_from_writes(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("{{ value }}")
+    (module / "dot_aliases").write_text("static")
+    config = {
+        "variables": {"value": "first"},
+        "dotfiles": {"shell": {"target": (tmp_path / "target").as_posix()}},
+    }
+    live_root = tmp_path / "live"
+    stats = StatsRecorder()
+
+    assert format_metrics(stats).endswith(
+        "stash_live_files 0\n# TYPE stash_live_size_bytes gauge\n"
+        "stash_live_size_bytes 0\n"
+    )
+
+    state = render_live(config, dotfiles, live_root, stats=stats)
+    (module / "dot_aliases").unlink()
+    config["variables"]["value"] = "second value"
+    render_live(
+        config,
+        dotfiles,
+        live_root,
+        state,
+        changed_paths={(module / "dot_aliases").resolve()},
+        changed_variables={"value"},
+        stats=stats,
+    )
+
+    lines = format_metrics(stats).splitlines()
+    assert "stash_live_files 1" in lines
+    assert "stash_live_size_bytes 12" in lines
+
+
+def test_restore_live_reports_live_tree_without_changes(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    for module_name in ("shell", "git"):
+        module = dotfiles / module_name
+        module.mkdir(parents=True)
+        (module / "dot_profile").write_text("{{ value }}")
+        (module / "dot_aliases").write_text("static")
+    config = {
+        "variables": {"value": "first"},
+        "dotfiles": {
+            name: {"target": (tmp_path / "target" / name).as_posix()}
+            for name in ("shell", "git")
+        },
+    }
+    live_root = tmp_path / "live"
+    restore_live(config, dotfiles, live_root)
+
+    stats = StatsRecorder()
+    restore_live(config, dotfiles, live_root, stats=stats)
+
+    lines = format_metrics(stats).splitlines()
+    assert stats.counters().get("templates_rendered", 0) == 0
+    assert "stash_live_files 4" in lines
+    assert "stash_live_size_bytes 22" in lines
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from stash.pathindex import PathIndex
+
+
+def test_path_index_matches_deepest_root():
+    dotfiles = Path("/dotfiles")
+    index = PathIndex(
+        [dotfiles / "shell", dotfiles / "editor", dotfiles / "editor/lua"]
+    )
+
+    assert index.match(dotfiles / "shell" / "conf.d" / "aliases") == (
+        dotfiles / "shell",
+        "conf.d/aliases",
+    )
+    assert index.match(dotfiles / "editor" / "lua" / "init.lua") == (
+        dotfiles / "editor/lua",
+        "init.lua",
+    )
+    assert index.match(dotfiles / "shell") == (dotfiles / "shell", "")
+    assert index.match(dotfiles / "shellrc") is None
+    assert index.match(Path("/elsewhere/shell/profile")) is None
+    assert index.group(
+        [dotfiles / "shell" / "profile", dotfiles / "editor" / "init.vim"]
+    ) == {dotfiles / "shell": {"profile"}, dotfiles / "editor": {"init.vim"}}
@@ -0,0 +1,67 @@
+import os
+from pathlib import Path
+
+from stash.live import render_live
+from stash.reconcile import plan_reconcile, reconcile_live
+
+
+def _render(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("{{ value }}")
+    (module / "dot_aliases").write_text("static")
+    (module / "dot_inputrc").write_text("set editing-mode vi")
+    target = tmp_path / "target"
+    config = {
+        "variables": {"value": "first"},
+        "dotfiles": {"shell": {"target": target.as_posix()}},
+    }
+    live_root = tmp_path / "live"
+    return render_live(config, dotfiles, live_root), dotfiles, live_root, target
+
+
+def test_reconcile_leaves_matching_links_untouched(tmp_path: Path):
+    state, _, live_root, target = _render(tmp_path)
+    inode = (target / ".profile").lstat().st_ino
+
+    plan = reconcile_live(state, live_root)
+
+    assert plan.is_empty
+    assert (target / ".profile").lstat().st_ino == inode
+
+
+def test_reconcile_repairs_links_and_removes_orphans(tmp_path: Path):
+    state, dotfiles, live_root, target = _render(tmp_path)
+    (target / ".profile").unlink()
+    (target / ".aliases").unlink()
+    (target / ".aliases").symlink_to(tmp_path / "elsewhere")
+    (target / ".stale").symlink_to(live_root / "shell" / ".stale")
+    (target / ".unrelated").symlink_to(tmp_path / "elsewhere")
+    (live_root / "shell" / ".stale").write_text("stale")
+    (live_root / "removed").mkdir()
+    (live_root / "shell" / ".inputrc").write_text("tampered")
+
+    plan = plan_reconcile(state, live_root)
+
+    assert plan.create_links == (
+        (target / ".profile", live_root / "shell" / ".profile"),
+    )
+    assert plan.replace_links == (
+        (target / ".aliases", live_root / "shell" / ".aliases"),
+    )
+    assert plan.remove_links == (target / ".stale",)
+    assert set(plan.remove_files) == {
+        live_root / "removed",
+        live_root / "shell" / ".stale",
+    }
+    assert plan.outdated_templates == ((dotfiles / "shell" / "dot_inputrc").resolve(),)
+
+    reconcile_live(state, live_root)
+
+    assert (target / ".profile").read_text() == "first"
+    assert (target / ".aliases").read_text() == "static"
+    assert not (target / ".stale").is_symlink()
+    assert os.readlink(target / ".unrelated") == str(tmp_path / "elsewhere")
+    assert not (live_root / "removed").exists()
+    assert not (live_root / "shell" / ".stale").exists()
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+from stash.live import _write_live_file
+from stash.snapshot import load_snapshot, restore_live
+
+
+def _write_module(tmp_path: Path) -> tuple[Path, Path, Path, dict]:
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("{{ value }}")
+    (module / "dot_aliases").write_text("static")
+    live_root = tmp_path / "live"
+    config = {
+        "variables": {"value": "first"},
+        "dotfiles": {"shell": {"target": (tmp_path / "target").as_posix()}},
+    }
+    return dotfiles, module, live_root, config
+
+
+def test_restore_live_saves_snapshot_on_first_start(tmp_path: Path):
+    dotfiles, _, live_root, config = _write_module(tmp_path)
+
+    state = restore_live(config, dotfiles, live_root)
+    snapshot = load_snapshot(live_root, dotfiles)
+
+    assert snapshot is not None
+    assert snapshot.state.templates == state.templates
+    assert snapshot.state.module_targets == state.module_targets
+    assert (live_root / "shell" / ".profile").read_text() == "first"
+
+
+def test_restore_live_skips_rendering_when_nothing_changed(
+    tmp_path: Path,
+    monkeypatch,
+):
+    dotfiles, _, live_root, config = _write_module(tmp_path)
+    restore_live(config, dotfiles, live_root)
+    renders: list[Path] = []
+
+    def render_templates(module: Path, *args, **kwargs):
+        renders.append(module)
+        return []
+
+    monkeypatch.setattr("stash.live.render_templates", render_templates)
+    state = restore_live(config, dotfiles, live_root)
+
+    assert renders == []
+    assert set(state.module_names) == {"shell"}
+
+
+def test_restore_live_rerenders_templates_changed_while_stopped(
+    tmp_path: Path,
+    monkeypatch,
+):
+    dotfiles, module, live_root, config = _write_module(tmp_path)
+    restore_live(config, dotfiles, live_root)
+    writes: list[Path] = []
+
+    def write_live_file(path: Path, content: str) -> None:
+        writes.append(path.relative_to(live_root))
+        _write_live_file(path, content)
+
+    monkeypatch.setattr("stash.live._write_live_file", write_live_file)
+    (module / "dot_aliases").write_text("changed")
+    restore_live(config, dotfiles, live_root)
+    config["variables"]["value"] = "second"
+    restore_live(config, dotfiles, live_root)
+
+    assert writes == [Path("shell/.aliases"), Path("shell/.profile")]
+    assert (live_root / "shell" / ".aliases").read_text() == "changed"
+    assert (live_root / "shell" / ".profile").read_text() == "second"
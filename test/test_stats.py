@@ -0,0 +1,69 @@
+import time
+from pathlib import Path
+
+from stash.live import render_live
+from stash.stats import StatsRecorder
+
+
+def test_phases_record_time_excluding_nested_phases():
+    stats = StatsRecorder()
+
+    with stats.phase("outer"):
+        time.sleep(0.01)
+        with stats.phase("inner"):
+            time.sleep(0.02)
+
+    histograms = stats.histograms()
+    assert histograms["inner"].total >= 0.02
+    assert 0.01 <= histograms["outer"].total < histograms["inner"].total
+    assert histograms["outer"].count == 1
+
+
+def test_histogram_buckets_are_cumulative():
+    stats = StatsRecorder()
+    for seconds in (0.0001, 0.003, 0.003, 20.0):
+        stats.observe("render", seconds)
+
+    buckets = stats.to_json()["phases"]["render"]["buckets"]
+
+    assert buckets["0.0005"] == 1
+    assert buckets["0.005"] == 3
+    assert buckets["10.0"] == 3
+    assert buckets["+Inf"] == 4
+
+
+def test_render_live_records_phases_and_counters(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("{{ value }}")
+    (module / "dot_aliases").write_text("static")
+    config = {
+        "variables": {"value": "first"},
+        "dotfiles": {"shell": {"target": (tmp_path / "target").as_posix()}},
+    }
+    stats = StatsRecorder()
+    state = render_live(config, dotfiles, tmp_path / "live", stats=stats)
+
+    config["variables"]["value"] = "second"
+    render_live(
+        config,
+        dotfiles,
+        tmp_path / "live",
+        state,
+        changed_variables={"value"},
+        stats=stats,
+    )
+
+    assert {"metadata_scan", "render", "write", "symlink", "render_live"} <= set(
+        stats.histograms()
+    )
+    assert stats.counters() == {
+        "renders": 2,
+        "full_renders": 1,
+        "incremental_renders": 1,
+        "templates_rendered": 3,
+        "files_written": 3,
+        "links_updated": 2,
+        "links_skipped": 1,
+    }
@@ -0,0 +1,171 @@
+import os
+from pathlib import Path
+
+from jinja2 import Environment
+
+from stash.templates import (
+    TemplateBytecodeCache,
+    TemplateMetadataCache,
+    render_templates,
+    template_environment,
+    template_metadata,
+)
+
+
+def test_bytecode_cache_reuses_compiled_templates(tmp_path: Path, monkeypatch):
+    module = tmp_path / "module"
+    module.mkdir()
+    (module / "profile").write_text("{{ value }}")
+    cache = TemplateBytecodeCache(tmp_path / "cache")
+
+    first = template_environment(module, cache)
+    assert first.get_template("profile").render(value="first") == "first"
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    second = template_environment(module, cache)
+
+    def compile_template(*args, **kwargs):
+        raise AssertionError("Expected the cached bytecode to be used")
+
+    monkeypatch.setattr(second, "compile", compile_template)
+    assert second.get_template("profile").render(value="second") == "second"
+
+
+def test_bytecode_cache_evicts_least_recently_used_entries(tmp_path: Path):
+    module = tmp_path / "module"
+    module.mkdir()
+    cache_directory = tmp_path / "cache"
+    cache = TemplateBytecodeCache(cache_directory)
+    for name in ("first", "second"):
+        (module / name).write_text(f"{name} {{{{ value }}}}")
+        template_environment(module, cache).get_template(name)
+    entries = sorted(cache_directory.iterdir())
+    for index, entry in enumerate(entries):
+        os.utime(entry, ns=(index, index))
+    newest = entries[-1]
+
+    cache = TemplateBytecodeCache(cache_directory, newest.stat().st_size * 2 + 64)
+    (module / "third").write_text("third")
+    template_environment(module, cache).get_template("third")
+
+    remaining = set(cache_directory.iterdir())
+    assert newest in remaining
+    assert entries[0] not in remaining
+    assert len(remaining) == 2
+
+
+def test_bytecode_cache_tracks_recently_loaded_entries(tmp_path: Path):
+    module = tmp_path / "module"
+    module.mkdir()
+    cache_directory = tmp_path / "cache"
+    cache = TemplateBytecodeCache(cache_directory)
+    entries: list[Path] = []
+    for name in ("first", "second", "third"):
+        (module / name).write_text(f"{name} {{{{ value }}}}")
+        template_environment(module, cache).get_template(name)
+        entries.extend(set(cache_directory.iterdir()) - set(entries))
+    first, second, third = entries
+    template_environment(module, cache).get_template("first")
+
+    cache.max_size = first.stat().st_size + third.stat().st_size + 64
+    (module / "fourth").write_text("fourth")
+    template_environment(module, cache).get_template("fourth")
+
+    remaining = set(cache_directory.iterdir())
+    assert first in remaining
+    assert second not in remaining
+    assert third not in remaining
+    assert len(remaining) == 2
+
+
+def test_metadata_cache_parses_only_changed_files(tmp_path: Path, monkeypatch):
+    module = tmp_path / "module"
+    module.mkdir()
+    for name in ("first", "second", "third"):
+        (module / name).write_text(f"{{{{ {name} }}}}")
+    cache = TemplateMetadataCache()
+    template_metadata(module, cache)
+    parsed: list[str] = []
+    parse = Environment.parse
+
+    def count_parse(self, source, *args, **kwargs):
+        parsed.append(source)
+        return parse(self, source, *args, **kwargs)
+
+    monkeypatch.setattr(Environment, "parse", count_parse)
+    (module / "second").write_text("{{ changed }}")
+    templates = template_metadata(module, cache)
+
+    assert parsed == ["{{ changed }}"]
+    assert templates["second"].variable_names == {"changed"}
+    assert templates["first"].variable_names == {"first"}
+
+    cache.invalidate([module / "first"])
+    template_metadata(module, cache)
+
+    assert parsed == ["{{ changed }}", "{{ first }}"]
+
+
+def test_metadata_records_method_receivers_as_variable_paths(tmp_path: Path):
+    module = tmp_path / "module"
+    module.mkdir()
+    (module / "items").write_text(
+        "{% for name, value in colors.items() %}{{ value }}{% endfor %}"
+    )
+    (module / "get").write_text("{{ colors.get('base00') }} {{ hosts.web.get(key) }}")
+
+    templates = template_metadata(module)
+
+    assert templates["items"].variable_paths == {"colors"}
+    assert templates["get"].variable_paths == {"colors", "hosts.web", "key"}
+
+
+def test_metadata_records_variable_access_paths(tmp_path: Path):
+    module = tmp_path / "module"
+    module.mkdir()
+    (module / "colors").write_text(
+        '{{ colors.base01 }} {{ colors["base0D"] | upper }} {{ hosts[index] }}'
+        "{% for item in items %}{{ item.name }}{% endfor %}"
+    )
+
+    metadata = template_metadata(module)["colors"]
+
+    assert metadata.variable_paths == {
+        "colors.base01",
+        "colors.base0D",
+        "hosts",
+        "index",
+        "items",
+    }
+
+
+def test_metadata_marks_binary_files(tmp_path: Path):
+    module = tmp_path / "module"
+    module.mkdir()
+    (module / "icon.png").write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00")
+    (module / "latin1").write_bytes(b"caf\xe9")
+    (module / "profile").write_text("{{ value }}")
+
+    templates = template_metadata(module)
+
+    assert templates["icon.png"].is_binary
+    assert templates["latin1"].is_binary
+    assert not templates["profile"].is_binary
+    assert render_templates(module, {"value": "x"})[0].metadata.template_name == (
+        "profile"
+    )
+
+
+def test_render_traces_attempted_template_names(tmp_path: Path):
+    module = tmp_path / "module"
+    module.mkdir()
+    (module / "fallback.j2").write_text("fallback")
+    (module / "profile").write_text(
+        "{% include 'local.j2' ignore missing %}"
+        "{% include ['host.j2', 'fallback.j2'] %}"
+    )
+
+    (rendered,) = render_templates(module, {}, selected={"profile"})
+
+    assert rendered.content == "fallback"
+    assert rendered.loaded_names == {"local.j2", "host.j2", "fallback.j2"}
@@ -2,8 +2,14 @@ from pathlib import Path
 
 import pytest
 
-from stash.config import BASE16_COLOR_NAMES, template_variables, theme_names
-from stash.live import render_live
+from stash.config import (
+    BASE16_COLOR_NAMES,
+    changed_variable_paths,
+    library_root,
+    template_variables,
+    theme_names,
+)
+from stash.live import _write_live_file, render_live
 
 
 def _colors(prefix: str) -> dict[str, str]:
@@ -69,3 +75,59 @@ def test_live_render_can_switch_theme_without_a_generation(tmp_path: Path):
 
     render_live(config, dotfiles, live_root, state, theme_name="light")
     assert (live_root / "terminal" / "colors.conf").read_text() == "light-base01"
+
+
+def test_changed_variable_paths_reports_changed_leaves():
+    old = {"colors": {"base00": "a", "base01": "b"}, "host": "one", "gone": 1}
+    new = {"colors": {"base00": "a", "base01": "c"}, "host": "one", "added": 2}
+
+    assert changed_variable_paths(old, new) == {"colors.base01", "gone", "added"}
+
+
+def test_theme_switch_rerenders_only_templates_using_changed_slots(
+    tmp_path: Path,
+    monkeypatch,
+):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "terminal"
+    module.mkdir(parents=True)
+    (module / "background.conf").write_text("{{ colors.base00 }}")
+    (module / "accent.conf").write_text("{{ colors['base0D'] }}")
+    live_root = tmp_path / "live"
+    config = _config()
+    config["themes"]["light"]["base00"] = "dark-base00"
+    config["dotfiles"] = {"terminal": {"target": (tmp_path / "target").as_posix()}}
+    state = render_live(config, dotfiles, live_root)
+    writes: list[Path] = []
+
+    def write_live_file(path: Path, content: str) -> None:
+        writes.append(path.relative_to(live_root))
+        _write_live_file(path, content)
+
+    monkeypatch.setattr("stash.live._write_live_file", write_live_file)
+    changed_variables = changed_variable_paths(
+        template_variables(config, dotfiles),
+        template_variables(config, dotfiles, "light"),
+    )
+    render_live(
+        config,
+        dotfiles,
+        live_root,
+        state,
+        theme_name="light",
+        changed_variables=changed_variables,
+    )
+
+    assert writes == [Path("terminal/accent.conf")]
+    assert (live_root / "terminal" / "accent.conf").read_text() == "light-base0D"
+
+
+def test_library_root_must_stay_within_dotfiles(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+
+    assert library_root({}, dotfiles) is None
+    assert (
+        library_root({"library_dir": "lib"}, dotfiles) == (dotfiles / "lib").resolve()
+    )
+    with pytest.raises(ValueError, match="stay within"):
+        library_root({"library_dir": "../lib"}, dotfiles)
@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+from stash.live import render_live
+from stash.stats import StatsRecorder
+from stash.tracing import Tracer
+
+
+def test_render_live_writes_trace_events(tmp_path: Path):
+    dotfiles = tmp_path / "dotfiles"
+    module = dotfiles / "shell"
+    module.mkdir(parents=True)
+    (module / "dot_profile").write_text("{{ value }}")
+    config = {
+        "variables": {"value": "first"},
+        "dotfiles": {"shell": {"target": (tmp_path / "target").as_posix()}},
+    }
+    trace_path = tmp_path / "trace.json"
+    tracer = Tracer(trace_path)
+    stats = StatsRecorder(tracer)
+    state = render_live(config, dotfiles, tmp_path / "live", stats=stats)
+    config["variables"]["value"] = "second"
+    render_live(
+        config,
+        dotfiles,
+        tmp_path / "live",
+        state,
+        changed_variables={"value"},
+        stats=stats,
+    )
+    with stats.span("hook", track="hooks", script="post-reload.d/10-notify.sh"):
+        pass
+    tracer.close()
+
+    events = json.loads(trace_path.read_text())
+    spans = [event for event in events if event["ph"] == "X"]
+    tracks = {
+        event["args"]["name"]: event["tid"] for event in events if event["ph"] == "M"
+    }
+    assert {
+        "template",
+        "write",
+        "symlink",
+        "metadata_scan",
+        "render",
+        "render_live",
+        "hook",
+    } <= {event["name"] for event in spans}
+    assert {
+        "module": "shell",
+        "templates": ["dot_profile"],
+    } in [event["args"] for event in spans if event["name"] == "render"]
+    assert {"module": "shell", "path": ".profile"} in [
+        event["args"] for event in spans if event["name"] == "template"
+    ]
+    hook = next(event for event in spans if event["name"] == "hook")
+    assert hook["tid"] == tracks["hooks"] != tracks["MainThread"]
+    assert all(event["dur"] >= 0 for event in spans)
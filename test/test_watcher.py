@@ -0,0 +1,147 @@
+import asyncio
+from pathlib import Path
+
+from inotify.constants import (
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_MODIFY,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+)
+
+from stash.watcher import InotifyHeader, InotifyWatcher, coalesce_events, event_names
+
+
+def _changes(events) -> set[tuple[str, str]]:
+    return {
+        (Path(watch_path, filename).as_posix(), name)
+        for _, names, watch_path, filename in events
+        for name in names
+    }
+
+
+def test_watcher_reports_events_from_new_directories(tmp_path: Path):
+    async def run():
+        watcher = InotifyWatcher()
+        watcher.add_tree(tmp_path)
+        try:
+            (tmp_path / "profile").write_text("first")
+            events = await asyncio.wait_for(watcher.read_events(), 1)
+            assert ((tmp_path / "profile").as_posix(), "IN_CLOSE_WRITE") in _changes(
+                events
+            )
+
+            (tmp_path / "nested").mkdir()
+            (tmp_path / "nested" / "early").write_text("early")
+            await asyncio.sleep(0.05)
+            changes = _changes(watcher.take_events())
+            assert ((tmp_path / "nested" / "early").as_posix(), "IN_CREATE") in changes
+            (tmp_path / "nested" / "late").write_text("late")
+            await asyncio.sleep(0.05)
+            changes = _changes(watcher.take_events())
+            assert ((tmp_path / "nested" / "late").as_posix(), "IN_CLOSE_WRITE") in (
+                changes
+            )
+        finally:
+            watcher.close()
+
+    asyncio.run(run())
+
+
+def test_watcher_stops_waiting_when_stopped(tmp_path: Path):
+    async def run():
+        watcher = InotifyWatcher()
+        watcher.add_tree(tmp_path)
+        stop_event = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.01, stop_event.set)
+        try:
+            assert await asyncio.wait_for(watcher.read_events(stop_event), 1) == []
+        finally:
+            watcher.close()
+
+    asyncio.run(run())
+
+
+def _event(mask: int, filename: str, cookie: int = 0):
+    return (InotifyHeader(1, mask, cookie, 0), event_names(mask), "/dots", filename)
+
+
+def test_coalesce_events_collapses_temporary_files_and_rename_chains():
+    atomic_save = [
+        _event(IN_CREATE, "profile.tmp"),
+        _event(IN_CLOSE_WRITE, "profile.tmp"),
+        _event(IN_MOVED_FROM, "profile.tmp", 7),
+        _event(IN_MOVED_TO, "profile", 7),
+    ]
+    assert [(event[0].mask, event[3]) for event in coalesce_events(atomic_save)] == [
+        (IN_CREATE, "profile"),
+        (IN_CLOSE_WRITE, "profile"),
+        (IN_MOVED_TO, "profile"),
+    ]
+
+    chain = [
+        _event(IN_MODIFY, "a"),
+        _event(IN_MOVED_FROM, "a", 1),
+        _event(IN_MOVED_TO, "b", 1),
+        _event(IN_MOVED_FROM, "b", 2),
+        _event(IN_MOVED_TO, "c", 2),
+    ]
+    assert [(event[0].mask, event[3]) for event in coalesce_events(chain)] == [
+        (IN_MODIFY, "c"),
+        (IN_MOVED_FROM, "a"),
+        (IN_MOVED_TO, "c"),
+    ]
+
+
+def test_read_quiet_waits_for_burst_to_settle(tmp_path: Path):
+    async def run():
+        watcher = InotifyWatcher()
+        watcher.add_tree(tmp_path)
+        loop = asyncio.get_running_loop()
+        for index in range(3):
+            loop.call_later(
+                0.02 * index,
+                (tmp_path / f"file{index}").write_text,
+                "contents",
+            )
+        try:
+            events = await watcher.read_quiet(0.1, loop.time() + 1)
+            assert {
+                ((tmp_path / f"file{index}").as_posix(), "IN_CLOSE_WRITE")
+                for index in range(3)
+            } <= _changes(events)
+        finally:
+            watcher.close()
+
+    asyncio.run(run())
+
+
+def test_watcher_tracks_configured_trees_only(tmp_path: Path):
+    async def run():
+        (tmp_path / ".git" / "objects").mkdir(parents=True)
+        (tmp_path / "shell").mkdir()
+        watcher = InotifyWatcher()
+        watcher.add_watch(tmp_path)
+        watcher.set_trees([tmp_path / "shell", tmp_path / "editor"])
+        try:
+            assert watcher.watch_count == 2
+
+            (tmp_path / ".git" / "objects" / "pack").write_text("pack")
+            (tmp_path / "editor").mkdir()
+            (tmp_path / "editor" / "init.lua").write_text("vim.o.number = true")
+            events = await watcher.read_quiet(
+                0.05, asyncio.get_running_loop().time() + 1
+            )
+            changes = _changes(events)
+            assert ((tmp_path / "editor" / "init.lua").as_posix(), "IN_CREATE") in (
+                changes
+            )
+            assert not any(".git/" in path for path, _ in changes)
+            assert watcher.watch_count == 3
+
+            watcher.set_trees([tmp_path / "editor"])
+            assert watcher.watch_count == 2
+        finally:
+            watcher.close()
+
+    asyncio.run(run())